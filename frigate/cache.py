@@ -0,0 +1,185 @@
+"""Persistent on-disk cache of loaded charts."""
+import hashlib
+import json
+import os
+import tempfile
+
+import frigate
+from frigate.sources import chart_files, chart_source
+from frigate.utils import ValueRow
+
+DEFAULT_MAX_SIZE = 64 * 1024 * 1024
+
+
+def default_cache_dir():
+    """Return the directory frigate caches into.
+
+    Follows the XDG base directory spec, using ``$XDG_CACHE_HOME/frigate`` and
+    falling back to ``~/.cache/frigate``.
+
+    Returns:
+        str: Path to the cache directory.
+
+    """
+    root = os.environ.get("XDG_CACHE_HOME") or os.path.join(
+        os.path.expanduser("~"), ".cache"
+    )
+    return os.path.join(root, "frigate")
+
+
+class ChartCache:
+    """Content addressed store of the rows traversed from charts.
+
+    Entries are keyed by a digest of the files a chart is loaded from along with the
+    frigate version, so any edit to a chart or an upgrade of frigate misses the cache.
+    Each hit refreshes the entry's modification time and the least recently used
+    entries are evicted once the cache grows beyond ``max_size`` bytes.
+
+    Args:
+        path (str, optional): Directory to store entries in. Defaults to :func:`default_cache_dir`.
+        max_size (int, optional): Maximum size of all entries in bytes.
+
+    """
+
+    def __init__(self, path=None, max_size=DEFAULT_MAX_SIZE):
+        self.path = path or default_cache_dir()
+        self.max_size = max_size
+
+    def key(self, chartdir, *options):
+        """Compute the cache key for a chart.
+
+        The key covers ``Chart.yaml``, ``Chart.lock``, ``values.yaml`` and the dependencies
+        in ``charts/``, including the chart files of unpacked subcharts, along with the
+        frigate version and any extra options which change the loaded rows.
+
+        Args:
+            chartdir (str or frigate.sources.ChartSource): Path to the Helm chart.
+            *options: Extra values to mix into the key.
+
+        Returns:
+            str: Hex digest identifying the chart contents.
+
+        """
+        source = chart_source(chartdir)
+        digest = hashlib.sha256()
+        digest.update(json.dumps([frigate.__version__, options]).encode())
+        for name in chart_files(source):
+            digest.update(name.encode() + b"\0")
+            with source.open(name) as fh:
+                for block in iter(lambda: fh.read(1024 * 1024), b""):
+                    digest.update(block)
+            digest.update(b"\0")
+        return digest.hexdigest()
+
+    def values_key(self, path, *options):
+        """Compute the cache key for the blocks of a values file.
+
+        Unlike :meth:`key` this only covers the location of the file, so the entry is
+        replaced as the file is edited rather than a new one being added.
+
+        Args:
+            path (str): Path to the values file.
+            *options: Extra values to mix into the key.
+
+        Returns:
+            str: Hex digest identifying the values file.
+
+        """
+        options = [frigate.__version__, os.path.abspath(path), options]
+        return hashlib.sha256(json.dumps(options).encode()).hexdigest()
+
+    def get(self, key):
+        """Read an entry from the cache.
+
+        Args:
+            key (str): Cache key from :meth:`key`.
+
+        Returns:
+            tuple: The cached ``(chart, values)`` or ``None`` on a miss.
+
+        """
+        path = self._entry(key)
+        try:
+            with open(path, "r") as fh:
+                entry = json.load(fh)
+            os.utime(path)
+        except (OSError, ValueError):
+            return None
+        return entry["chart"], [ValueRow(*row) for row in entry["values"]]
+
+    def put(self, key, chart, values):
+        """Write an entry to the cache and evict old entries if it has grown too large.
+
+        Nothing is written if the cache directory isn't writable.
+
+        Args:
+            key (str): Cache key from :meth:`key`.
+            chart (dict): Contents of `Chart.yaml`.
+            values (list): Traversed value rows.
+
+        """
+        entry = {"chart": chart, "values": [list(row) for row in values]}
+        try:
+            os.makedirs(self.path, exist_ok=True)
+            fd, tmpname = tempfile.mkstemp(dir=self.path, suffix=".tmp")
+        except OSError:
+            # Charts still load without a writable cache, they just aren't kept
+            return
+        try:
+            with os.fdopen(fd, "w") as fh:
+                json.dump(entry, fh, default=str)
+            os.replace(tmpname, self._entry(key))
+        except OSError:
+            return
+        finally:
+            if os.path.exists(tmpname):
+                os.remove(tmpname)
+        self.evict()
+
+    def evict(self):
+        """Remove the least recently used entries until the cache fits in ``max_size``."""
+        entries = []
+        for name in os.listdir(self.path):
+            if not name.endswith(".json"):
+                continue
+            try:
+                stat = os.stat(os.path.join(self.path, name))
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, name))
+        total = sum(size for _, size, _ in entries)
+        for _, size, name in sorted(entries):
+            if total <= self.max_size:
+                break
+            try:
+                os.remove(os.path.join(self.path, name))
+            except OSError:
+                pass
+            total -= size
+
+    def load(self, loader, chartdir, *options, **kwargs):
+        """Load a chart through the cache.
+
+        Args:
+            loader (callable): Function to load the chart on a miss, such as
+                :func:`frigate.gen.load_chart_with_dependencies`.
+            chartdir (str): Path to the Helm chart.
+            *options: Extra values to mix into the key.
+            **kwargs: Passed on to ``loader``.
+
+        Returns:
+            chart (dict): Contents of `Chart.yaml` loaded into a dict.
+            values (list): Traversed value rows.
+
+        """
+        key = self.key(chartdir, *options)
+        cached = self.get(key)
+        if cached is not None:
+            return cached
+        chart, values = loader(chartdir, **kwargs)
+        values = list(values)
+        self.put(key, chart, values)
+        return chart, values
+
+    def _entry(self, key):
+        return os.path.join(self.path, f"{key}.json")
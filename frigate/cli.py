@@ -1,7 +1,11 @@
+import contextlib
+import os
+
 import click
+import frigate.fetch
 import frigate.gen
 import frigate.pre_commit_hook
-from frigate.utils import list_templates
+from frigate.utils import format_extension, list_templates
 
 
 @click.group()
@@ -15,8 +19,9 @@ def cli():
     "-o",
     "--output-format",
     "output_format",
-    default="markdown",
-    help="Output format for the documentation",
+    default=["markdown"],
+    multiple=True,
+    help="Output format for the documentation, may be given several times",
     type=click.Choice(list_templates()),
 )
 @click.option(
@@ -25,10 +30,149 @@ def cli():
 @click.option(
     "--no-deps", is_flag=True, default=True, help="Do not render dependency values",
 )
-def gen(filename, output_format, no_credits, no_deps):
-    click.echo(
-        frigate.gen.gen(filename, output_format, credits=no_credits, deps=no_deps)
-    )
+@click.option(
+    "--fast", is_flag=True, default=False, help="Parse values with the faster safe loader",
+)
+@click.option(
+    "--cache", is_flag=True, default=False, help="Reuse values cached by previous runs",
+)
+@click.option(
+    "--stream",
+    is_flag=True,
+    default=False,
+    help="Stream values rather than loading the whole values file",
+)
+@click.option(
+    "--incremental",
+    is_flag=True,
+    default=False,
+    help="Only re-parse the sections of values files which changed",
+)
+@click.option(
+    "--dep-jobs",
+    "dep_jobs",
+    default=1,
+    type=click.IntRange(min=1),
+    help="Number of chart dependencies to load at once",
+)
+@click.option(
+    "--helm-timeout",
+    "helm_timeout",
+    default=None,
+    type=float,
+    help="Seconds to allow each helm command to run for",
+)
+@click.option(
+    "--fetch",
+    default="helm",
+    type=click.Choice(["helm", "native"]),
+    help="Fetch missing dependencies with helm or the built-in fetcher",
+)
+@click.option(
+    "--fetch-timeout",
+    "fetch_timeout",
+    default=frigate.fetch.FETCH_TIMEOUT,
+    type=float,
+    help="Seconds the built-in fetcher waits on a chart repository for each request",
+)
+@click.option(
+    "--rev",
+    default=None,
+    help="Read the chart from this git revision rather than the working tree",
+)
+@click.option(
+    "--output",
+    default=None,
+    type=click.File("w", atomic=True),
+    help="Write the documentation to this file as it is rendered, - for stdout",
+)
+@click.option(
+    "--output-dir",
+    "output_dir",
+    default=None,
+    type=click.Path(file_okay=False),
+    help="Write the documentation for each format to a README in this directory",
+)
+@click.option(
+    "--split",
+    "split_dir",
+    default=None,
+    type=click.Path(file_okay=False),
+    help="Write the documentation for each top-level key to its own file in this directory",
+)
+def gen(
+    filename,
+    output_format,
+    no_credits,
+    no_deps,
+    fast,
+    cache,
+    stream,
+    incremental,
+    dep_jobs,
+    helm_timeout,
+    fetch,
+    fetch_timeout,
+    rev,
+    output,
+    output_dir,
+    split_dir,
+):
+    formats = list(dict.fromkeys(output_format))
+    if len([option for option in (output, output_dir, split_dir) if option is not None]) > 1:
+        raise click.UsageError("Only one of --output, --output-dir and --split may be given.")
+    if len(formats) > 1 and output_dir is None and split_dir is None:
+        raise click.UsageError("Several output formats need --output-dir to write them to.")
+    updater = frigate.fetch.get_updater(fetch, helm_timeout=helm_timeout, fetch_timeout=fetch_timeout)
+    if split_dir is not None:
+        try:
+            frigate.gen.gen_split(
+                filename,
+                formats,
+                split_dir,
+                credits=no_credits,
+                deps=no_deps,
+                fast=fast,
+                cache=cache,
+                stream=stream,
+                incremental=incremental,
+                dep_jobs=dep_jobs,
+                updater=updater,
+                rev=rev,
+            )
+        except ValueError as e:
+            raise click.UsageError(str(e))
+        return
+
+    with contextlib.ExitStack() as stack:
+        if output_dir is not None:
+            os.makedirs(output_dir, exist_ok=True)
+            output = {
+                format: stack.enter_context(
+                    click.open_file(
+                        os.path.join(output_dir, f"README.{format_extension(format)}"),
+                        "w",
+                        atomic=True,
+                    )
+                )
+                for format in formats
+            }
+        docs = frigate.gen.gen(
+            filename,
+            formats if output_dir is not None else formats[0],
+            credits=no_credits,
+            deps=no_deps,
+            fast=fast,
+            cache=cache,
+            stream=stream,
+            incremental=incremental,
+            dep_jobs=dep_jobs,
+            updater=updater,
+            rev=rev,
+            output=output,
+        )
+    if output is None:
+        click.echo(docs)
 
 
 @cli.command(context_settings=dict(
@@ -60,5 +204,82 @@ def gen(filename, output_format, no_credits, no_deps):
     default=True,
     help="Do not render dependency values",
 )
-def hook(artifact, output_format, no_credits, no_deps):
-    frigate.pre_commit_hook.main(artifact, output_format, credits=no_credits, deps=no_deps)
+@click.option(
+    "--fast",
+    is_flag=True,
+    default=False,
+    help="Parse values with the faster safe loader",
+)
+@click.option(
+    "--cache",
+    is_flag=True,
+    default=False,
+    help="Reuse values cached by previous runs",
+)
+@click.option(
+    "--stream",
+    is_flag=True,
+    default=False,
+    help="Stream values rather than loading the whole values file",
+)
+@click.option(
+    "--incremental",
+    is_flag=True,
+    default=False,
+    help="Only re-parse the sections of values files which changed",
+)
+@click.option(
+    "--dep-jobs",
+    "dep_jobs",
+    default=1,
+    type=click.IntRange(min=1),
+    help="Number of chart dependencies to load at once",
+)
+@click.option(
+    "--helm-timeout",
+    "helm_timeout",
+    default=None,
+    type=float,
+    help="Seconds to allow each helm command to run for",
+)
+@click.option(
+    "--fetch",
+    default="helm",
+    type=click.Choice(["helm", "native"]),
+    help="Fetch missing dependencies with helm or the built-in fetcher",
+)
+@click.option(
+    "--fetch-timeout",
+    "fetch_timeout",
+    default=frigate.fetch.FETCH_TIMEOUT,
+    type=float,
+    help="Seconds the built-in fetcher waits on a chart repository for each request",
+)
+def hook(
+    artifact,
+    output_format,
+    no_credits,
+    no_deps,
+    fast,
+    cache,
+    stream,
+    incremental,
+    dep_jobs,
+    helm_timeout,
+    fetch,
+    fetch_timeout,
+):
+    frigate.pre_commit_hook.main(
+        artifact,
+        output_format,
+        credits=no_credits,
+        deps=no_deps,
+        fast=fast,
+        cache=cache,
+        stream=stream,
+        incremental=incremental,
+        dep_jobs=dep_jobs,
+        helm_timeout=helm_timeout,
+        fetch=fetch,
+        fetch_timeout=fetch_timeout,
+    )
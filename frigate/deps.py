@@ -0,0 +1,533 @@
+"""Resolve the dependencies of a chart and fetch them into its ``charts/`` folder."""
+import asyncio
+import gzip
+import hashlib
+import os
+import re
+import shutil
+import subprocess
+import tarfile
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+
+from ruamel.yaml import YAML
+
+from frigate.sources import chart_source
+
+VERSION_PATTERN = re.compile(
+    r"^v?(\d+|[xX*])(?:\.(\d+|[xX*]))?(?:\.(\d+|[xX*]))?"
+    r"(?:-([0-9A-Za-z.-]+))?(?:\+[0-9A-Za-z.-]+)?$"
+)
+COMPARATOR_PATTERN = re.compile(r"^(!=|>=|=>|<=|=<|~>|[=<>~^])?\s*(\S+)$")
+WILDCARDS = ("x", "X", "*")
+
+
+def parse_version(version):
+    """Parse a semantic version into a key which sorts in precedence order.
+
+    Args:
+        version (str): A version such as ``1.2.3`` or ``v1.0.0-rc.1``.
+
+    Returns:
+        tuple: ``(major, minor, patch, prerelease)`` where releases sort after their prereleases.
+
+    Raises:
+        ValueError: If the version isn't a full semantic version.
+
+    """
+    match = VERSION_PATTERN.match(str(version).strip())
+    if match is None or None in match.group(1, 2, 3) or _wildcard(match):
+        raise ValueError(f"Invalid version {version!r}")
+    return tuple(int(part) for part in match.group(1, 2, 3)) + (
+        _prerelease(match.group(4)),
+    )
+
+
+def _wildcard(match):
+    return any(part in WILDCARDS for part in match.group(1, 2, 3))
+
+
+def _prerelease(prerelease):
+    if prerelease is None:
+        return (1,)
+    return (0,) + tuple(
+        (0, int(part), "") if part.isdigit() else (1, 0, part)
+        for part in prerelease.split(".")
+    )
+
+
+def version_matches(version, constraint):
+    """Check whether a version satisfies a constraint.
+
+    Constraints follow the syntax helm accepts in ``Chart.yaml``. Comparators separated
+    by commas or spaces must all match, and groups separated by ``||`` are alternatives.
+    Comparators may use ``=``, ``!=``, ``>``, ``>=``, ``<``, ``<=``, the ``~`` and ``^``
+    ranges, ``x`` wildcards or a hyphen range such as ``1.2 - 1.4``. As with helm,
+    prereleases only match constraints which mention a prerelease.
+
+    Args:
+        version (str): The version to check.
+        constraint (str): The version constraint.
+
+    Returns:
+        bool: Whether the version satisfies the constraint.
+
+    Raises:
+        ValueError: If the version or constraint can't be parsed.
+
+    """
+    key = parse_version(version)
+    for group in str(constraint).split("||"):
+        comparators = _comparators(group)
+        if key[3] != (1,) and not any(prerelease for _, _, _, prerelease in comparators):
+            continue
+        if all(_compare(key, *comparator[:3]) for comparator in comparators):
+            return True
+    return False
+
+
+def _comparators(group):
+    group = re.sub(r"\s+-\s+", " - ", group.strip())
+    tokens = [token for token in re.split(r"[\s,]+", group) if token]
+    # Join operators written apart from their version, such as ">= 1.2"
+    joined = []
+    for token in tokens:
+        if joined and re.fullmatch(r"!=|>=|=>|<=|=<|~>|[=<>~^]", joined[-1]):
+            joined[-1] += token
+        else:
+            joined.append(token)
+    comparators = []
+    index = 0
+    while index < len(joined):
+        if index + 2 < len(joined) and joined[index + 1] == "-":
+            low, high = _bounds(joined[index]), _bounds(joined[index + 2])
+            comparators.append((">=", *low))
+            comparators.append(("<=", *high))
+            index += 3
+            continue
+        match = COMPARATOR_PATTERN.match(joined[index])
+        if match is None:
+            raise ValueError(f"Invalid version constraint {group!r}")
+        comparators.append(((match.group(1) or "="), *_bounds(match.group(2))))
+        index += 1
+    return comparators or [("=", None, None, False)]
+
+
+def _bounds(version):
+    """Return the ``(lowest, next, prerelease)`` versions a partial version covers.
+
+    ``next`` is ``None`` for full versions, otherwise it is the first version beyond
+    the partial one, so ``1.2`` covers versions from ``1.2.0`` up to but not including
+    ``1.3.0``. Versions which are entirely a wildcard cover every version.
+
+    """
+    match = VERSION_PATTERN.match(version)
+    if match is None:
+        raise ValueError(f"Invalid version {version!r}")
+    parts = []
+    for part in match.group(1, 2, 3):
+        if part is None or part in WILDCARDS:
+            break
+        parts.append(int(part))
+    if not parts:
+        return None, None, False
+    prerelease = match.group(4)
+    low = tuple(parts + [0] * (3 - len(parts))) + (_prerelease(prerelease),)
+    if len(parts) == 3:
+        return low, None, prerelease is not None
+    high = parts[:-1] + [parts[-1] + 1]
+    return low, tuple(high + [0] * (3 - len(high))) + ((0,),), False
+
+
+def _compare(key, operator, low, high):
+    if low is None:
+        return operator not in ("!=", "<", ">")
+    if operator in ("~", "~>"):
+        upper = high or (low[0], low[1] + 1, 0, (0,))
+        return low <= key < upper
+    if operator == "^":
+        if low[0] != 0 or high is not None and high[:2] == (1, 0):
+            upper = (low[0] + 1, 0, 0, (0,))
+        elif low[1] != 0 or high is not None and high[1] == 1:
+            upper = (0, low[1] + 1, 0, (0,))
+        else:
+            upper = high or (0, 0, low[2] + 1, (0,))
+        return low <= key < upper
+    if high is None:
+        return {
+            "=": key == low,
+            "!=": key != low,
+            ">": key > low,
+            ">=": key >= low,
+            "=>": key >= low,
+            "<": key < low,
+            "<=": key <= low,
+            "=<": key <= low,
+        }[operator]
+    return {
+        "=": low <= key < high,
+        "!=": not low <= key < high,
+        ">": key >= high,
+        ">=": key >= low,
+        "=>": key >= low,
+        "<": key < low,
+        "<=": key < high,
+        "=<": key < high,
+    }[operator]
+
+
+def index_charts(chartdir):
+    """Index the dependency charts which have been fetched into a chart's ``charts/`` folder.
+
+    Both packaged ``.tgz`` archives and unpacked chart directories are indexed. Only
+    the ``Chart.yaml`` of each archive is read.
+
+    Args:
+        chartdir (str or frigate.sources.ChartSource): Path to the Helm chart.
+
+    Returns:
+        dict: Maps each chart name to a list of ``(version, path)`` pairs, where ``path``
+        is the archive or folder of the chart within the parent chart.
+
+    """
+    source = chart_source(chartdir)
+    index = {}
+    loader = YAML(typ="safe")
+    for name in source.listdir("charts"):
+        path = f"charts/{name}"
+        if name.endswith(".tgz"):
+            with source.open(path) as fh:
+                chart = _archive_chart(fh, loader)
+        elif source.exists(f"{path}/Chart.yaml"):
+            chart = loader.load(source.read(f"{path}/Chart.yaml"))
+        else:
+            continue
+        if isinstance(chart, dict) and "name" in chart:
+            index.setdefault(chart["name"], []).append((str(chart.get("version")), path))
+    return index
+
+
+def _archive_chart(fh, loader):
+    # Read through gzip as tarfile's stream mode can't skip the extra header helm writes
+    try:
+        with gzip.open(fh, "rb") as gz, tarfile.open(fileobj=gz, mode="r|") as archive:
+            for member in archive:
+                parts = member.name.split("/")
+                if len(parts) == 2 and parts[1] == "Chart.yaml" and member.isfile():
+                    return loader.load(archive.extractfile(member).read())
+    except (OSError, tarfile.TarError):
+        return None
+    return None
+
+
+def resolve_dependencies(chartdir, dependencies):
+    """Match the dependencies of a chart to the charts in its ``charts/`` folder.
+
+    Each dependency is pinned to the version recorded for it in ``Chart.lock`` when
+    that still satisfies the constraint in ``Chart.yaml``, otherwise the newest version
+    in ``charts/`` which satisfies the constraint is used.
+
+    Args:
+        chartdir (str or frigate.sources.ChartSource): Path to the Helm chart.
+        dependencies (list): The ``dependencies`` listed in `Chart.yaml`.
+
+    Returns:
+        list: ``(dependency, path)`` pairs in the order of ``dependencies``, where ``path``
+        is the archive or folder of the matching chart within the parent chart or ``None``
+        if it is missing.
+
+    """
+    source = chart_source(chartdir)
+    index = index_charts(source)
+    locked = {}
+    if source.exists("Chart.lock"):
+        lock = YAML(typ="safe").load(source.read("Chart.lock")) or {}
+        for dependency in lock.get("dependencies") or []:
+            locked[dependency.get("name")] = str(dependency.get("version"))
+
+    resolved = []
+    for dependency in dependencies:
+        constraint = str(dependency.get("version") or "*")
+        candidates = []
+        for version, path in index.get(dependency["name"], []):
+            try:
+                if version_matches(version, constraint):
+                    candidates.append((parse_version(version), version, path))
+            except ValueError:
+                continue
+        pinned = [
+            candidate
+            for candidate in candidates
+            if candidate[1] == locked.get(dependency["name"])
+        ]
+        candidates = pinned or candidates
+        resolved.append((dependency, max(candidates)[2] if candidates else None))
+    return resolved
+
+
+def missing_dependencies(chartdir):
+    """List the dependencies of a chart which haven't been fetched into ``charts/``.
+
+    Args:
+        chartdir (str or frigate.sources.ChartSource): Path to the Helm chart.
+
+    Returns:
+        list: The missing ``dependencies`` from `Chart.yaml`.
+
+    """
+    source = chart_source(chartdir)
+    chart = YAML(typ="safe").load(source.read("Chart.yaml")) or {}
+    return [
+        dependency
+        for dependency, path in resolve_dependencies(source, chart.get("dependencies") or [])
+        if path is None
+    ]
+
+
+def lock_is_current(chartdir):
+    """Check whether ``Chart.lock`` pins every dependency listed in ``Chart.yaml``.
+
+    Args:
+        chartdir (str or frigate.sources.ChartSource): Path to the Helm chart.
+
+    Returns:
+        bool: Whether each dependency has a locked version from the same repository
+        which satisfies its constraint.
+
+    """
+    source = chart_source(chartdir)
+    if not source.exists("Chart.lock"):
+        return False
+    loader = YAML(typ="safe")
+    chart = loader.load(source.read("Chart.yaml")) or {}
+    lock = loader.load(source.read("Chart.lock")) or {}
+    locked = {
+        (dependency.get("name"), dependency.get("repository")): str(dependency.get("version"))
+        for dependency in lock.get("dependencies") or []
+    }
+    for dependency in chart.get("dependencies") or []:
+        version = locked.get((dependency["name"], dependency.get("repository")))
+        try:
+            if version is None or not version_matches(version, dependency.get("version") or "*"):
+                return False
+        except ValueError:
+            return False
+    return True
+
+
+class HelmUpdater:
+    """Fetch the dependencies of charts into their ``charts/`` folders with helm.
+
+    Each chart is updated at most once per run for each state of its ``Chart.yaml`` and
+    ``Chart.lock``, however often it is asked for. ``helm dep build`` is used when the
+    lock file is current so the locked versions are fetched without re-resolving them,
+    falling back to ``helm dep update`` otherwise. The output of helm is captured and
+    included in the error raised when it fails.
+
+    Args:
+        timeout (float, optional): Seconds to allow each helm command before killing it.
+        jobs (int, optional): Number of helm commands :meth:`update_all` runs at once.
+
+    """
+
+    def __init__(self, timeout=None, jobs=1):
+        self.timeout = timeout
+        self.jobs = jobs
+        self.cancelled = False
+        self.updates = {}
+        self.processes = set()
+        self.lock = threading.Lock()
+        self._helm = None
+
+    @property
+    def helm(self):
+        """Path to the helm command, which is looked up once."""
+        if self._helm is None:
+            self._helm = shutil.which("helm")
+            if self._helm is None:
+                raise RuntimeError(
+                    "Unable to locate `helm` command which is needed for updating dependencies. "
+                    "Please ensure `helm` is installed and available on the path. "
+                    "Alternatively run frigate again with the `--no-deps` flag to skip generating "
+                    "value table entried for dependencies."
+                )
+        return self._helm
+
+    def update(self, chart_path):
+        """Fetch the dependencies of a chart unless they have already been fetched this run.
+
+        Args:
+            chart_path (str): Path to the directory containing the helm chart.
+
+        Raises:
+            RuntimeError: If helm can't be found, fails, times out or was cancelled.
+
+        """
+        key = self._key(chart_path)
+        with self.lock:
+            future = self.updates.get(key)
+            owner = future is None
+            if owner:
+                future = self.updates[key] = Future()
+        if owner:
+            try:
+                self._update(chart_path)
+            except BaseException as e:
+                future.set_exception(e)
+            else:
+                future.set_result(None)
+        future.result()
+
+    async def update_async(self, chart_path):
+        """Fetch the dependencies of a chart without blocking the event loop.
+
+        Behaves like :meth:`update` but runs helm as an asyncio subprocess, and shares
+        updates with :meth:`update` called from other threads. Cancelling the task kills
+        the running helm command.
+
+        Args:
+            chart_path (str): Path to the directory containing the helm chart.
+
+        Raises:
+            RuntimeError: If helm can't be found, fails, times out or was cancelled.
+
+        """
+        key = self._key(chart_path)
+        with self.lock:
+            future = self.updates.get(key)
+            owner = future is None
+            if owner:
+                future = self.updates[key] = Future()
+        if not owner:
+            await asyncio.wrap_future(future)
+            return
+        try:
+            await self._update_async(chart_path)
+        except asyncio.CancelledError:
+            # Let a later call try again rather than failing with this task's cancellation
+            with self.lock:
+                self.updates.pop(key, None)
+            future.set_exception(RuntimeError("Updating chart dependencies was cancelled."))
+            raise
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        future.set_result(None)
+
+    def update_all(self, chart_paths):
+        """Fetch the dependencies of several charts concurrently.
+
+        If any update fails the rest are cancelled.
+
+        Args:
+            chart_paths (list): Paths to the directories containing the helm charts.
+
+        Raises:
+            RuntimeError: If any of the updates fail.
+
+        """
+        with ThreadPoolExecutor(max_workers=self.jobs) as executor:
+            futures = [executor.submit(self.update, path) for path in chart_paths]
+            try:
+                for future in futures:
+                    future.result()
+            except BaseException:
+                self.cancel()
+                raise
+
+    def cancel(self):
+        """Kill any running helm commands and refuse to start any more."""
+        with self.lock:
+            self.cancelled = True
+            processes = list(self.processes)
+        for process in processes:
+            process.kill()
+
+    def _key(self, chart_path):
+        digest = hashlib.sha256()
+        for name in ["Chart.yaml", "Chart.lock"]:
+            path = os.path.join(chart_path, name)
+            if os.path.isfile(path):
+                with open(path, "rb") as fh:
+                    digest.update(fh.read())
+            digest.update(b"\0")
+        return os.path.realpath(chart_path), digest.hexdigest()
+
+    def _update(self, chart_path):
+        if lock_is_current(chart_path):
+            if self._run(["dep", "build", "."], chart_path) == 0:
+                return
+        self._run(["dep", "update", "."], chart_path, check=True)
+
+    async def _update_async(self, chart_path):
+        if lock_is_current(chart_path):
+            if await self._run_async(["dep", "build", "."], chart_path) == 0:
+                return
+        await self._run_async(["dep", "update", "."], chart_path, check=True)
+
+    def _run(self, args, chart_path, check=False):
+        command = [self.helm] + args
+        with self.lock:
+            self._check_cancelled()
+            process = subprocess.Popen(
+                command,
+                cwd=chart_path,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.PIPE,
+            )
+            self.processes.add(process)
+        try:
+            _, stderr = process.communicate(timeout=self.timeout)
+        except subprocess.TimeoutExpired:
+            process.kill()
+            process.communicate()
+            raise self._timed_out(args, chart_path) from None
+        finally:
+            with self.lock:
+                self.processes.discard(process)
+        return self._result(args, chart_path, process.returncode, stderr, check)
+
+    async def _run_async(self, args, chart_path, check=False):
+        with self.lock:
+            self._check_cancelled()
+        process = await asyncio.create_subprocess_exec(
+            self.helm,
+            *args,
+            cwd=chart_path,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+        )
+        with self.lock:
+            self.processes.add(process)
+        try:
+            _, stderr = await asyncio.wait_for(process.communicate(), self.timeout)
+        except asyncio.TimeoutError:
+            process.kill()
+            await process.wait()
+            raise self._timed_out(args, chart_path) from None
+        except asyncio.CancelledError:
+            process.kill()
+            await process.wait()
+            raise
+        finally:
+            with self.lock:
+                self.processes.discard(process)
+        return self._result(args, chart_path, process.returncode, stderr, check)
+
+    def _result(self, args, chart_path, returncode, stderr, check):
+        self._check_cancelled()
+        if check and returncode != 0:
+            raise RuntimeError(
+                f"`helm {' '.join(args)}` failed in {chart_path}:\n"
+                + stderr.decode(errors="replace").strip()
+            )
+        return returncode
+
+    def _timed_out(self, args, chart_path):
+        return RuntimeError(
+            f"`helm {' '.join(args)}` timed out after {self.timeout} seconds in {chart_path}."
+        )
+
+    def _check_cancelled(self):
+        if self.cancelled:
+            raise RuntimeError("Updating chart dependencies was cancelled.")
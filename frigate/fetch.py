@@ -0,0 +1,337 @@
+"""Fetch chart dependencies straight from chart repositories without helm."""
+import hashlib
+import http.client
+import json
+import os
+import tempfile
+import threading
+import urllib.parse
+from concurrent.futures import Future, ThreadPoolExecutor, wait
+
+from ruamel.yaml import YAML
+
+from frigate.cache import default_cache_dir
+from frigate.deps import (
+    HelmUpdater,
+    lock_is_current,
+    missing_dependencies,
+    parse_version,
+    version_matches,
+)
+
+MAX_REDIRECTS = 5
+
+# Seconds to wait on a repository for each request, so a stalled server can't hang a run
+FETCH_TIMEOUT = 60
+
+
+class ConnectionPool:
+    """Keep-alive HTTP connections shared between threads.
+
+    Idle connections are kept for each scheme, host and port and reused by later
+    requests to the same server, so fetching many files from a repository only
+    connects to it once per thread.
+
+    Args:
+        timeout (float, optional): Seconds to wait on the server for each request.
+
+    """
+
+    def __init__(self, timeout=None):
+        self.timeout = timeout
+        self.idle = {}
+        self.lock = threading.Lock()
+
+    def request(self, url, headers=None):
+        """Make a ``GET`` request, following redirects.
+
+        Args:
+            url (str): The URL to request.
+            headers (dict, optional): Extra request headers.
+
+        Returns:
+            tuple: The response ``(status, headers, body)``.
+
+        Raises:
+            RuntimeError: If there are too many redirects.
+
+        """
+        for _ in range(MAX_REDIRECTS + 1):
+            status, response_headers, body = self._request(url, headers or {})
+            if status not in (301, 302, 303, 307, 308):
+                return status, response_headers, body
+            url = urllib.parse.urljoin(url, response_headers["Location"])
+        raise RuntimeError(f"Too many redirects fetching {url}.")
+
+    def close(self):
+        """Close all of the idle connections."""
+        with self.lock:
+            connections = [conn for conns in self.idle.values() for conn in conns]
+            self.idle = {}
+        for conn in connections:
+            conn.close()
+
+    def _request(self, url, headers):
+        parts = urllib.parse.urlsplit(url)
+        key = (parts.scheme, parts.netloc)
+        path = urllib.parse.urlunsplit(("", "", parts.path or "/", parts.query, ""))
+        # An idle connection may have been closed by the server, so retry on a new one
+        for reused in (True, False):
+            conn = self._connection(key) if reused else None
+            if conn is None:
+                reused = False
+                conn = self._connect(key)
+            try:
+                conn.request("GET", path, headers=headers)
+                response = conn.getresponse()
+                body = response.read()
+            except (http.client.HTTPException, OSError):
+                conn.close()
+                if reused:
+                    continue
+                raise
+            if response.will_close:
+                conn.close()
+            else:
+                with self.lock:
+                    self.idle.setdefault(key, []).append(conn)
+            return response.status, response.headers, body
+
+    def _connection(self, key):
+        with self.lock:
+            connections = self.idle.get(key)
+            return connections.pop() if connections else None
+
+    def _connect(self, key):
+        scheme, netloc = key
+        if scheme == "https":
+            return http.client.HTTPSConnection(netloc, timeout=self.timeout)
+        if scheme == "http":
+            return http.client.HTTPConnection(netloc, timeout=self.timeout)
+        raise RuntimeError(f"Unable to fetch from {scheme} URLs.")
+
+
+class ChartFetcher:
+    """Fetch the dependencies of charts into their ``charts/`` folders without helm.
+
+    This can be used in place of :class:`frigate.deps.HelmUpdater`. The ``index.yaml``
+    of each repository is downloaded once per run and kept on disk, being revalidated
+    with ``If-None-Match`` and ``If-Modified-Since`` on later runs. Missing
+    dependencies are then downloaded concurrently over pooled keep-alive connections
+    and checked against the digests in the repository index. Every download shares
+    one pool of ``jobs`` threads, however many charts are being updated at once.
+    Versions pinned in a
+    current ``Chart.lock`` are fetched, otherwise the newest version in the index which
+    satisfies the constraint in ``Chart.yaml`` is.
+
+    Only ``http`` and ``https`` repositories are supported.
+
+    Args:
+        cache_dir (str, optional): Directory to keep repository indexes in. Defaults
+            to a ``repositories`` folder in :func:`frigate.cache.default_cache_dir`.
+        timeout (float, optional): Seconds to wait on the repository for each request.
+        jobs (int, optional): Number of files to download at once.
+
+    """
+
+    def __init__(self, cache_dir=None, timeout=FETCH_TIMEOUT, jobs=4):
+        self.cache_dir = cache_dir or os.path.join(default_cache_dir(), "repositories")
+        self.pool = ConnectionPool(timeout=timeout)
+        self.jobs = jobs
+        self.cancelled = False
+        self.indexes = {}
+        self.lock = threading.Lock()
+        self.executor = None
+
+    def update(self, chart_path):
+        """Download the dependencies of a chart which are missing from ``charts/``.
+
+        Args:
+            chart_path (str): Path to the directory containing the helm chart.
+
+        Raises:
+            RuntimeError: If a dependency can't be found or downloaded, or the
+                fetcher was cancelled.
+
+        """
+        self._download_all(self._plan(chart_path))
+
+    def update_all(self, chart_paths):
+        """Download the missing dependencies of several charts.
+
+        If any update fails the rest are cancelled.
+
+        Args:
+            chart_paths (list): Paths to the directories containing the helm charts.
+
+        """
+        try:
+            self._download_all(
+                [download for path in chart_paths for download in self._plan(path)]
+            )
+        except BaseException:
+            self.cancel()
+            raise
+
+    def cancel(self):
+        """Stop starting any more downloads."""
+        self.cancelled = True
+
+    def _plan(self, chart_path):
+        # The (path, repository, entry) of each dependency missing from a chart
+        missing = missing_dependencies(chart_path)
+        if not missing:
+            return []
+        locked = {}
+        if lock_is_current(chart_path):
+            with open(os.path.join(chart_path, "Chart.lock"), "rb") as fh:
+                lock = YAML(typ="safe").load(fh) or {}
+            for dependency in lock.get("dependencies") or []:
+                locked[dependency["name"], dependency.get("repository")] = str(
+                    dependency["version"]
+                )
+        downloads = {}
+        for dependency in missing:
+            repository = dependency.get("repository") or ""
+            entry = self._select(
+                dependency, locked.get((dependency["name"], dependency.get("repository")))
+            )
+            name = f"{dependency['name']}-{entry['version']}.tgz"
+            downloads[name] = (repository, entry)
+        os.makedirs(os.path.join(chart_path, "charts"), exist_ok=True)
+        return [
+            (os.path.join(chart_path, "charts", name), *download)
+            for name, download in downloads.items()
+        ]
+
+    def _download_all(self, downloads):
+        with self.lock:
+            if self.executor is None:
+                self.executor = ThreadPoolExecutor(max_workers=self.jobs)
+        futures = [self.executor.submit(self._download, *download) for download in downloads]
+        wait(futures)
+        for future in futures:
+            future.result()
+
+    def index(self, repository):
+        """Return the index of a chart repository, downloading it at most once per run.
+
+        Args:
+            repository (str): URL of the chart repository.
+
+        Returns:
+            dict: Contents of the repository's ``index.yaml``.
+
+        """
+        url = repository.rstrip("/") + "/index.yaml"
+        with self.lock:
+            future = self.indexes.get(url)
+            owner = future is None
+            if owner:
+                future = self.indexes[url] = Future()
+        if owner:
+            try:
+                future.set_result(self._fetch_index(url))
+            except BaseException as e:
+                future.set_exception(e)
+        return future.result()
+
+    def _fetch_index(self, url):
+        self._check_cancelled()
+        cached = os.path.join(self.cache_dir, hashlib.sha256(url.encode()).hexdigest())
+        headers = {}
+        try:
+            with open(cached + ".json", "r") as fh:
+                validators = json.load(fh)
+        except (OSError, ValueError):
+            validators = {}
+        if os.path.isfile(cached + ".yaml"):
+            if validators.get("etag"):
+                headers["If-None-Match"] = validators["etag"]
+            if validators.get("last_modified"):
+                headers["If-Modified-Since"] = validators["last_modified"]
+
+        status, response_headers, body = self.pool.request(url, headers)
+        if status == 304:
+            with open(cached + ".yaml", "rb") as fh:
+                body = fh.read()
+        elif status == 200:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            _write_atomic(cached + ".yaml", body)
+            validators = {
+                "etag": response_headers.get("ETag"),
+                "last_modified": response_headers.get("Last-Modified"),
+            }
+            _write_atomic(cached + ".json", json.dumps(validators).encode())
+        else:
+            raise RuntimeError(f"Unable to fetch {url}: HTTP {status}.")
+        return YAML(typ="safe").load(body) or {}
+
+    def _select(self, dependency, locked_version):
+        repository = dependency.get("repository") or ""
+        if urllib.parse.urlsplit(repository).scheme not in ("http", "https"):
+            raise RuntimeError(
+                f"Unable to fetch dependency {dependency['name']} from {repository!r}, "
+                "only http and https repositories are supported without helm."
+            )
+        entries = (self.index(repository).get("entries") or {}).get(dependency["name"]) or []
+        constraint = str(dependency.get("version") or "*")
+        candidates = []
+        for entry in entries:
+            version = str(entry.get("version"))
+            try:
+                if locked_version is not None:
+                    matches = version == locked_version
+                else:
+                    matches = version_matches(version, constraint)
+                if matches:
+                    candidates.append((parse_version(version), entry))
+            except ValueError:
+                continue
+        if not candidates:
+            raise RuntimeError(
+                f"Unable to find dependency {dependency['name']} "
+                f"{locked_version or constraint} in {repository}."
+            )
+        return max(candidates, key=lambda candidate: candidate[0])[1]
+
+    def _download(self, path, repository, entry):
+        self._check_cancelled()
+        url = urllib.parse.urljoin(repository.rstrip("/") + "/", entry["urls"][0])
+        status, _, body = self.pool.request(url)
+        if status != 200:
+            raise RuntimeError(f"Unable to fetch {url}: HTTP {status}.")
+        digest = entry.get("digest")
+        if digest and hashlib.sha256(body).hexdigest() != digest.split(":")[-1]:
+            raise RuntimeError(f"Digest of {url} doesn't match the repository index.")
+        _write_atomic(path, body)
+
+    def _check_cancelled(self):
+        if self.cancelled:
+            raise RuntimeError("Fetching chart dependencies was cancelled.")
+
+
+def _write_atomic(path, data):
+    fd, tmpname = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+    with os.fdopen(fd, "wb") as fh:
+        fh.write(data)
+    os.replace(tmpname, path)
+
+
+def get_updater(fetch="helm", helm_timeout=None, jobs=1, fetch_timeout=FETCH_TIMEOUT):
+    """Create the updater which fetches missing chart dependencies for a run.
+
+    Args:
+        fetch (str, optional): ``helm`` to fetch with helm or ``native`` to use :class:`ChartFetcher`.
+        helm_timeout (float, optional): Seconds to allow each helm command to run for.
+        jobs (int, optional): Number of charts to update at once.
+        fetch_timeout (float, optional): Seconds the built-in fetcher waits on a repository
+            for each request.
+
+    Returns:
+        frigate.deps.HelmUpdater or ChartFetcher: The updater.
+
+    """
+    if fetch == "native":
+        return ChartFetcher(timeout=fetch_timeout, jobs=max(jobs, 4))
+    return HelmUpdater(timeout=helm_timeout, jobs=jobs)
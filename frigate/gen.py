@@ -1,50 +1,671 @@
+import asyncio
+import functools
+import hashlib
+import inspect
+import itertools
 import json
 import os.path
+import re
 import tempfile
-import shutil
-import subprocess
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
 
-from jinja2 import Environment, FileSystemLoader
-from ruamel.yaml import YAML
+from jinja2 import (
+    ChoiceLoader,
+    DictLoader,
+    Environment,
+    FileSystemBytecodeCache,
+    FileSystemLoader,
+    Template,
+)
+from ruamel.yaml import YAML, YAMLError
 from ruamel.yaml.comments import CommentedMap
+from ruamel.yaml.composer import ComposerError
+from ruamel.yaml.constructor import DuplicateKeyError, SafeConstructor
+from ruamel.yaml.events import (
+    AliasEvent,
+    MappingEndEvent,
+    MappingStartEvent,
+    ScalarEvent,
+    SequenceEndEvent,
+    SequenceStartEvent,
+    StreamEndEvent,
+)
+from ruamel.yaml.nodes import MappingNode, ScalarNode, SequenceNode
 
 from frigate import TEMPLATES_PATH, DOTFILE_NAME
-from frigate.utils import flatten
+from frigate.cache import ChartCache, default_cache_dir
+from frigate.deps import HelmUpdater, missing_dependencies, resolve_dependencies
+from frigate.precompile import builtin_loader
+from frigate.renderers import INDEX_RENDERERS, RENDERERS
+from frigate.sources import ArchiveSource, DirectorySource, chart_files, chart_source, git_source
+from frigate.utils import ValueRow, format_extension, write_if_changed
 
 yaml = YAML()
+# The round-trip loader keeps its parsing state on the instance, so threads need their own
+_thread_yaml = threading.local()
 
+MERGE_TAG = "tag:yaml.org,2002:merge"
+STR_TAG = "tag:yaml.org,2002:str"
 
-def load_chart(chartdir, root=None):
+# Number of nodes aliases may add to values when expanded, see alias_expansion
+MAX_EXPANSION = 1000000
+
+# Number of chunks native renderers produce in the executor at a time for gen_async
+RENDER_BATCH_SIZE = 1000
+
+# Set to keep compiled templates in memory only, rather than in the on-disk cache
+NO_BYTECODE_CACHE_ENV = "FRIGATE_NO_BYTECODE_CACHE"
+
+# Anchors and aliases link top-level blocks together, so values using them aren't split
+ANCHOR_PATTERN = re.compile(r"(?:^|[\s\[{,])[&*]\S", re.MULTILINE)
+
+
+class CommentedDict(dict):
+    """A plain dict which also carries the inline comments of its keys.
+
+    Produced by :func:`fast_load` in place of ``ruamel.yaml.comments.CommentedMap``.
+    """
+
+    __slots__ = ("comments",)
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.comments = {}
+
+
+class FastConstructor(SafeConstructor):
+    """Safe constructor which attaches line scanned inline comments to mappings."""
+
+    line_comments = {}
+
+    def construct_yaml_map(self, node):
+        data = CommentedDict()
+        yield data
+        # Only the mapping's own keys carry comments, not those pulled in by merge keys
+        own_keys = []
+        merged = []
+        for key_node, value_node in node.value:
+            if key_node.tag != MERGE_TAG:
+                own_keys.append((key_node, value_node))
+            elif isinstance(value_node, SequenceNode):
+                merged.extend(value_node.value)
+            else:
+                merged.append(value_node)
+        mapping = self.construct_mapping(node)
+        # Like the round-trip loader keep the mapping's own keys first and append the
+        # keys pulled in by merge keys after them
+        for key_node, value_node in own_keys:
+            key = self.construct_object(key_node)
+            data[key] = mapping[key]
+            # The round-trip loader drops the comment after an alias, which can only
+            # refer back to a node earlier in the document
+            if _is_alias(key_node, value_node):
+                continue
+            mark = key_node.start_mark
+            comment = self.line_comments.get(mark.line)
+            if comment is not None and comment[0] == mark.column and comment[1]:
+                data.comments[key] = comment[1]
+        for merged_node in merged:
+            for key_node, _ in merged_node.value:
+                key = self.construct_object(key_node)
+                if key not in data:
+                    data[key] = mapping[key]
+        data.update(mapping)
+
+
+FastConstructor.add_constructor(
+    "tag:yaml.org,2002:map", FastConstructor.construct_yaml_map
+)
+
+
+def _is_alias(key_node, value_node):
+    """Return whether a key's composed value node was reached through an alias."""
+    return value_node.start_mark.index < key_node.start_mark.index
+
+
+def fast_load(text):
+    """Load YAML with the safe loader and a separate inline comment scanner.
+
+    The safe loader is backed by libyaml through ``ruamel.yaml.clib``, which frigate
+    depends on under CPython, and skips all of the round-trip machinery. The comments
+    which :func:`get_comment` would extract are recovered with
+    :func:`scan_inline_comments` instead.
+
+    Args:
+        text (str): YAML document.
+
+    Returns:
+        obj: The document with every mapping loaded as a :class:`CommentedDict`.
+
+    """
+    loader = YAML(typ="safe")
+    node = loader.compose(text)
+    if node is None:
+        return None
+    constructor = FastConstructor(loader=loader)
+    constructor.line_comments = scan_inline_comments(text)
+    return constructor.construct_document(node)
+
+
+def round_trip_load(text):
+    """Load YAML with a round-trip loader which is safe to use from the current thread.
+
+    Args:
+        text (str): YAML document.
+
+    Returns:
+        obj: The document with every mapping loaded as a ``CommentedMap``.
+
+    """
+    if threading.current_thread() is threading.main_thread():
+        return yaml.load(text)
+    loader = getattr(_thread_yaml, "loader", None)
+    if loader is None:
+        loader = _thread_yaml.loader = YAML()
+    return loader.load(text)
+
+
+class DefaultEncoder:
+    """Serialize default values, memoizing the result for shared subtrees.
+
+    Mappings and sequences which are referenced from several rows, such as those
+    behind YAML aliases, are only serialized once. ``CommentedMap`` objects directly
+    within the default are converted to plain dicts before they are serialized.
+
+    Args:
+        dumps (callable, optional): Function to serialize a value to a string with.
+            Defaults to ``json.dumps``.
+
+    """
+
+    def __init__(self, dumps=None):
+        self.dumps = dumps or json.dumps
+        self.memo = {}
+
+    def __call__(self, value):
+        if not isinstance(value, (dict, list)):
+            return self.dumps(value)
+        # The value is kept alongside its encoding so the id can't be reused
+        cached = self.memo.get(id(value))
+        if cached is not None and cached[0] is value:
+            return cached[1]
+        if isinstance(value, list):
+            default = [
+                (dict(item) if isinstance(item, CommentedMap) else item) for item in value
+            ]
+        elif isinstance(value, CommentedMap):
+            default = dict(value)
+        else:
+            default = value
+        encoded = self.dumps(default)
+        self.memo[id(value)] = (value, encoded)
+        return encoded
+
+
+def _encoder_name(encoder):
+    """Name an encoder for use in cache keys.
+
+    Returns ``None`` for encoders which can't be told apart by name, such as lambdas,
+    bound methods and callable objects, whose rows mustn't be cached.
+    """
+    if isinstance(encoder, DefaultEncoder):
+        encoder = encoder.dumps
+    if encoder is None:
+        encoder = json.dumps
+    if isinstance(encoder, functools.partial):
+        name = _encoder_name(encoder.func)
+        arguments = repr((encoder.args, sorted(encoder.keywords.items())))
+        # Objects without a repr of their own only differ by address
+        if name is None or " at 0x" in arguments:
+            return None
+        return f"{name}{arguments}"
+    qualname = getattr(encoder, "__qualname__", None)
+    bound = getattr(encoder, "__self__", None)
+    if qualname is None or "<" in qualname or not (bound is None or inspect.ismodule(bound)):
+        return None
+    return f"{encoder.__module__}.{qualname}"
+
+
+def _encoder(encoder):
+    """Return a memoizing :class:`DefaultEncoder` for an encoder argument."""
+    if isinstance(encoder, DefaultEncoder):
+        return encoder
+    return DefaultEncoder(encoder)
+
+
+class LineComments:
+    """Look up the in-line comment on a line by reading a file forwards.
+
+    Only the current line is held in memory so the file must be queried in
+    increasing line order, which is the order the parser reports keys in.
+
+    Args:
+        fh (file): Text file to read lines from.
+
+    """
+
+    def __init__(self, fh):
+        self.fh = fh
+        self.lineno = -1
+        self.comment = None
+        self.depth = 0
+
+    def get(self, lineno):
+        """Return the ``(column, comment)`` of a line as :func:`scan_inline_comments` would."""
+        while self.lineno < lineno:
+            line = self.fh.readline()
+            self.lineno += 1
+            self.comment = None
+            if self.depth or _may_comment(line):
+                self.comment, self.depth = _line_comment(line, self.depth)
+        return self.comment
+
+    def describe(self, mark):
+        """Return the comment describing the key at a mark."""
+        comment = self.get(mark.line)
+        if comment is not None and comment[0] == mark.column:
+            return comment[1]
+        return ""
+
+
+def stream_values(
+    path, root=None, encoder=None, max_expansion=MAX_EXPANSION, source=None
+):
+    """Traverse a values file driven by parser events.
+
+    Rows are yielded as soon as each leaf value and the comment on its key's line
+    have been read, without loading the whole document. Only the leaf being yielded,
+    the path to it and any anchored nodes are held in memory, so this can traverse
+    values files which are too large to load. The rows are the same as
+    ``traverse(yaml.load(...))`` would give.
+
+    Args:
+        path (str): Path to the values file.
+        root (list, optional): The root of the namespace we are currently at. Used for recursion.
+        encoder (callable, optional): Function to serialize default values with, see :class:`DefaultEncoder`.
+        max_expansion (int, optional): Maximum number of nodes aliases may add to each value.
+        source (frigate.sources.ChartSource, optional): Chart to read ``path`` from rather than disk.
+
+    Raises:
+        ValueError: If a value has recursive aliases or they add more than ``max_expansion`` nodes.
+        ruamel.yaml.composer.ComposerError: If the file holds more than one document.
+
+    Yields:
+        ValueRow(param, comment, value): Each namespaced parameter (str), the comment (str) and value (obj).
+
+    """
+    encoder = _encoder(encoder)
+    loader = YAML(typ="safe")
+    # Comments of anchored nodes are kept so aliases to them can be documented later on
+    anchor_comments = {}
+    anchors = {}
+    anchored = set()
+
+    def compose(event, events):
+        """Build the node starting with ``event`` from the rest of its events."""
+        if isinstance(event, AliasEvent):
+            return anchors[event.anchor]
+        if isinstance(event, ScalarEvent):
+            tag = event.tag
+            if tag is None or tag == "!":
+                tag = loader.resolver.resolve(ScalarNode, event.value, event.implicit)
+            node = ScalarNode(tag, event.value, event.start_mark, event.end_mark)
+        elif isinstance(event, SequenceStartEvent):
+            tag = event.tag
+            if tag is None or tag == "!":
+                tag = loader.resolver.resolve(SequenceNode, None, event.implicit)
+            node = SequenceNode(tag, [], event.start_mark, event.end_mark)
+            for item in events:
+                if isinstance(item, SequenceEndEvent):
+                    break
+                node.value.append(compose(item, events))
+        else:
+            tag = event.tag
+            if tag is None or tag == "!":
+                tag = loader.resolver.resolve(MappingNode, None, event.implicit)
+            node = MappingNode(tag, [], event.start_mark, event.end_mark)
+            for item in events:
+                if isinstance(item, MappingEndEvent):
+                    break
+                node.value.append((compose(item, events), compose(next(events), events)))
+        if event.anchor is not None:
+            anchors[event.anchor] = node
+            anchored.add(id(node))
+        return node
+
+    constructor = FastConstructor(loader=loader)
+    constructor.line_comments = anchor_comments
+
+    def construct(node, comments):
+        """Construct a composed node, reading the comments of its keys along the way.
+
+        Returns the constructed value along with its shared containers.
+        """
+        # Walk the keys in document order, the comments can only be read forwards
+        pending = [(False, node, False)]
+        read = []
+        reachable = set()
+        while pending:
+            is_key, item, in_anchor = pending.pop()
+            in_anchor = in_anchor or id(item) in anchored
+            if is_key:
+                line = item.start_mark.line
+                if in_anchor:
+                    reachable.add(line)
+                # Aliased nodes point back to lines which have already been read
+                if line >= comments.lineno and line not in anchor_comments:
+                    anchor_comments[line] = comments.get(line)
+                    read.append(line)
+            elif isinstance(item, MappingNode):
+                for key_node, value_node in reversed(item.value):
+                    pending.append((False, value_node, in_anchor))
+                    pending.append((True, key_node, in_anchor))
+            elif isinstance(item, SequenceNode):
+                pending.extend((False, value, in_anchor) for value in reversed(item.value))
+        value = constructor.construct_document(node)
+        # Only the keys of anchored nodes can be constructed again, by aliases to them
+        for line in read:
+            if line not in reachable:
+                del anchor_comments[line]
+        # Only values which involve anchors can share containers
+        shared = _check_expansion(value, max_expansion) if anchors else frozenset()
+        return value, shared
+
+    opener = open if source is None else source.open_text
+    with opener(path) as fh, opener(path) as comment_fh:
+        comments = LineComments(comment_fh)
+        events = iter(loader.parse(fh))
+        for event in events:
+            if isinstance(event, MappingStartEvent):
+                break
+        else:
+            return
+        # Each frame holds the mapping's parameter prefix, its own keys, the mappings
+        # merged into it, the comment on the key it is nested under and where it starts
+        prefix = "".join(key + "." for key in root) if root else ""
+        root_mark = event.start_mark
+        stack = [(prefix, set(), [], None, root_mark)]
+        while stack:
+            event = next(events)
+            prefix, keys, merged, comment, start_mark = stack[-1]
+            if isinstance(event, MappingEndEvent):
+                stack.pop()
+                remaining = CommentedDict()
+                for mapping in merged:
+                    for key, value in mapping.items():
+                        if key not in keys and key not in remaining:
+                            remaining[key] = value
+                if remaining:
+                    shared = _check_expansion(remaining, max_expansion)
+                    yield from _traverse(remaining, prefix, encoder, shared, {})
+                elif not keys and comment is not None:
+                    yield ValueRow(prefix[:-1], comment, {}, encoder)
+                continue
+            key_node = compose(event, events)
+            value_event = next(events)
+            key_tag = key_node.tag
+            if key_tag == MERGE_TAG:
+                value, _ = construct(compose(value_event, events), comments)
+                merged.extend(value if isinstance(value, list) else [value])
+                continue
+            if key_tag == STR_TAG:
+                key = key_node.value
+            else:
+                key, _ = construct(key_node, comments)
+            if key in keys:
+                raise DuplicateKeyError(
+                    "while constructing a mapping",
+                    start_mark,
+                    f'found duplicate key "{key}"',
+                    key_node.start_mark,
+                )
+            keys.add(key)
+            key_comment = comments.describe(key_node.start_mark)
+            # Like the round-trip loader aliases don't carry the comment on their line
+            if isinstance(value_event, AliasEvent):
+                key_comment = ""
+            if isinstance(value_event, MappingStartEvent) and value_event.anchor is None:
+                stack.append(
+                    (prefix + key + ".", set(), [], key_comment, value_event.start_mark)
+                )
+                continue
+            default, shared = construct(compose(value_event, events), comments)
+            if isinstance(default, dict) and default != {}:
+                yield from _traverse(default, prefix + key + ".", encoder, shared, {})
+            else:
+                yield ValueRow(prefix + key, key_comment, default, encoder)
+        # Like the loaders, only a single document is allowed
+        next(events)
+        event = next(events)
+        if not isinstance(event, StreamEndEvent):
+            raise ComposerError(
+                "expected a single document in the stream",
+                root_mark,
+                "but found another document",
+                event.start_mark,
+            )
+
+
+def split_values(text):
+    """Split a values document into blocks of lines for each top-level key.
+
+    Any comments and blank lines before the first key belong to the first block, and
+    those after each key's value belong to its block.
+
+    Args:
+        text (str): Contents of a values file.
+
+    Returns:
+        list: The text of each block, or ``None`` if the document can't safely be split
+        because it uses anchors, aliases, merge keys, multiple documents or isn't a block
+        mapping.
+
+    """
+    if ANCHOR_PATTERN.search(text):
+        return None
+    blocks = [[]]
+    for line in text.splitlines(keepends=True):
+        first = line[:1]
+        if first and first not in " \t#\r\n":
+            # Merge keys fold another mapping into the top level rather than adding a key
+            if first in "-.%?[{!|>" or line.startswith("<<"):
+                return None
+            if any(not _blank(block_line) for block_line in blocks[-1]):
+                blocks.append([])
+        blocks[-1].append(line)
+    return ["".join(block) for block in blocks]
+
+
+def _blank(line):
+    """Return whether a line only holds whitespace or a comment."""
+    stripped = line.strip()
+    return not stripped or stripped.startswith("#")
+
+
+def incremental_values(
+    path,
+    cache,
+    root=None,
+    fast=False,
+    encoder=None,
+    max_expansion=MAX_EXPANSION,
+    source=None,
+):
+    """Traverse a values file reusing the rows of unchanged top-level blocks.
+
+    The file is split into one block per top-level key with :func:`split_values` and
+    the rows of each block are cached against a digest of its text. Only the blocks
+    which changed since the last run are parsed and traversed, so editing one section
+    of a large values file only re-parses that section. The rows are the same as a full
+    traversal gives. Files which can't be split, or whose rows are serialized by an
+    encoder that can't be named in the cache, are traversed in full.
+
+    Args:
+        path (str): Path to the values file.
+        cache (frigate.cache.ChartCache): Cache to store the rows of each block in.
+        root (list, optional): The root of the namespace to prefix parameters with.
+        fast (bool, optional): Parse with the safe loader and a line scanner for comments.
+        encoder (callable, optional): Function to serialize default values with, see :class:`DefaultEncoder`.
+        max_expansion (int, optional): Maximum number of nodes aliases may add to values.
+        source (frigate.sources.ChartSource, optional): Chart to read ``path`` from rather than disk.
+
+    Returns:
+        list: The traversed rows.
+
+    """
+    load = fast_load if fast else round_trip_load
+    with (open if source is None else source.open_text)(path) as fh:
+        text = fh.read()
+    blocks = split_values(text)
+    encoder_name = _encoder_name(encoder)
+    if blocks is None or encoder_name is None:
+        return list(
+            traverse(load(text), root=root, encoder=encoder, max_expansion=max_expansion)
+        )
+
+    location = path if source is None else source.describe(path)
+    key = cache.values_key(location, root, encoder_name, fast, max_expansion)
+    cached = cache.get(key)
+    previous = {}
+    cached_index = None
+    if cached is not None:
+        index, rows = cached
+        cached_index = index["blocks"]
+        start = 0
+        for digest, name, count in index["blocks"]:
+            previous[digest] = (name, rows[start:start + count])
+            start += count
+
+    index = []
+    values = []
+    names = set()
+    for block in blocks:
+        digest = hashlib.sha256(block.encode()).hexdigest()
+        if digest in previous:
+            name, rows = previous[digest]
+        else:
+            # Flow collections and quoted scalars may continue on unindented lines, so a
+            # block can be cut short of its value
+            try:
+                tree = load(block)
+            except YAMLError:
+                break
+            # A block which doesn't hold exactly one key wasn't split where expected
+            if not isinstance(tree, dict) or len(tree) != 1:
+                break
+            name = str(next(iter(tree)))
+            rows = list(
+                traverse(tree, root=root, encoder=encoder, max_expansion=max_expansion)
+            )
+        # Later duplicates of a key override earlier ones, which needs a full parse
+        if name in names:
+            break
+        names.add(name)
+        index.append((digest, name, len(rows)))
+        values.extend(rows)
+    else:
+        # Only rewrite the entry when a block changed
+        if [list(entry) for entry in index] != cached_index:
+            cache.put(key, {"blocks": index}, values)
+        return values
+    return list(
+        traverse(load(text), root=root, encoder=encoder, max_expansion=max_expansion)
+    )
+
+
+def load_chart(
+    chartdir,
+    root=None,
+    fast=False,
+    stream=False,
+    encoder=None,
+    max_expansion=MAX_EXPANSION,
+    incremental=None,
+):
     """Load the yaml information from a Helm chart directory.
 
     Load in the `Chart.yaml` and `values.yaml` files from a Helm
     chart.
 
     Args:
-        chartdir (str): Path to the Helm chart.
+        chartdir (str or frigate.sources.ChartSource): Path to the Helm chart.
         root (list, optional): The root of the namespace we are currently at. Used for recursion.
+        fast (bool, optional): Parse with the safe loader and a line scanner for comments.
+        stream (bool, optional): Return a generator which streams values with :func:`stream_values`.
+        encoder (callable, optional): Function to serialize default values with, see :class:`DefaultEncoder`.
+        max_expansion (int, optional): Maximum number of nodes aliases may add to values.
+        incremental (frigate.cache.ChartCache, optional): Reuse the rows of unchanged top-level
+            blocks of `values.yaml` from this cache, see :func:`incremental_values`.
 
     Returns:
         chart (dict): Contents of `Chart.yaml` loaded into a dict.
         values (dict): Contents of `values.yaml` loaded into a dict.
 
     """
-    with open(os.path.join(chartdir, "values.yaml"), "r") as fh:
-        values = yaml.load(fh.read())
-    with open(os.path.join(chartdir, "Chart.yaml"), "r") as fh:
-        chart = yaml.load(fh.read())
-    return chart, list(traverse(values, root=root))
+    source = chart_source(chartdir)
+    load = fast_load if fast or stream else round_trip_load
+    with source.open_text("Chart.yaml") as fh:
+        chart = load(fh.read())
+    if stream:
+        return chart, stream_values(
+            "values.yaml",
+            root=root,
+            encoder=encoder,
+            max_expansion=max_expansion,
+            source=source,
+        )
+    if incremental:
+        return chart, incremental_values(
+            "values.yaml",
+            incremental,
+            root=root,
+            fast=fast,
+            encoder=encoder,
+            max_expansion=max_expansion,
+            source=source,
+        )
+    with source.open_text("values.yaml") as fh:
+        values = load(fh.read())
+    return chart, list(
+        traverse(values, root=root, encoder=encoder, max_expansion=max_expansion)
+    )
 
 
-def load_chart_with_dependencies(chartdir, root=None):
+def load_chart_with_dependencies(
+    chartdir,
+    root=None,
+    fast=False,
+    stream=False,
+    encoder=None,
+    max_expansion=MAX_EXPANSION,
+    incremental=None,
+    dep_jobs=1,
+    loaded=None,
+    updater=None,
+):
     """
     Load and return dictionaries representing Chart.yaml and values.yaml from
     the Helm chart. If Chart.yaml declares dependencies, recursively merge in
-    their values as well.
+    their values as well. Dependencies are matched to the charts already in the
+    charts/ folder and helm is only run to fetch them when some are missing.
+    Packaged dependencies are read in memory without unpacking them to disk, and
+    with ``dep_jobs`` above one the direct dependencies are loaded concurrently.
+    Each distinct dependency chart is only loaded once however many charts depend
+    on it or aliases it is included under, and its rows are namespaced for each.
 
     Args:
-        chartdir (str): Path to the Helm chart.
+        chartdir (str or frigate.sources.ChartSource): Path to the Helm chart.
         root (list, optional): The root of the namespace we are currently at. Used for recursion.
+        fast (bool, optional): Parse with the safe loader and a line scanner for comments.
+        stream (bool, optional): Stream values with :func:`stream_values`.
+        encoder (callable, optional): Function to serialize default values with, see :class:`DefaultEncoder`.
+        max_expansion (int, optional): Maximum number of nodes aliases may add to values.
+        incremental (frigate.cache.ChartCache, optional): Reuse the rows of unchanged top-level
+            blocks of values files from this cache.
+        dep_jobs (int, optional): Number of dependencies to load at once.
+        loaded (LoadedCharts, optional): The dependency charts already loaded. Used for recursion.
+        updater (frigate.deps.HelmUpdater, optional): Fetches missing dependencies into `charts/`.
 
     Returns:
         chart (dict): Contents of `Chart.yaml` loaded into a dict.
@@ -52,73 +673,205 @@ def load_chart_with_dependencies(chartdir, root=None):
     """
     if root is None:
         root = []
-    chart, values = load_chart(chartdir, root=root)
+    # Share one encoder with the dependencies so their defaults are memoized together
+    encoder = _encoder(encoder)
+    source = chart_source(chartdir)
+    if loaded is None:
+        loaded = LoadedCharts()
+    chart, values = load_chart(
+        source,
+        root=root,
+        fast=fast,
+        stream=stream,
+        encoder=encoder,
+        max_expansion=max_expansion,
+        incremental=incremental,
+    )
     if "dependencies" in chart:
-        # update the helm chart's charts/ folder
-        update_chart_dependencies(chartdir)
-
-        # recursively update values by unpacking the helm charts in the charts/ folder
-        for dependency in chart["dependencies"]:
-            dependency_name = dependency["name"]
-            dependency_path = os.path.join(
-                chartdir, "charts", f"{dependency_name}-{dependency['version']}.tgz",
-            )
-            with tempfile.TemporaryDirectory() as tmpdirname:
-                shutil.unpack_archive(dependency_path, tmpdirname)
-                dependency_dir = os.path.join(tmpdirname, dependency_name)
+        # only ask helm to update the charts/ folder when a dependency hasn't been fetched
+        resolved = resolve_dependencies(source, chart["dependencies"])
+        if any(path is None for _, path in resolved):
+            if isinstance(source, DirectorySource):
+                update_chart_dependencies(source.path, updater)
+            else:
+                source = fetch_dependencies(source, updater)
+            resolved = resolve_dependencies(source, chart["dependencies"])
 
+        for dependency, dependency_path in resolved:
+            if dependency_path is None:
+                raise RuntimeError(
+                    f"Unable to find dependency {dependency['name']} {dependency.get('version')} "
+                    f"in {source.describe('charts')}."
+                )
+
+        def load_dependency(resolved_dependency):
+            dependency, dependency_path = resolved_dependency
+            dependency_name = dependency.get("alias") or dependency["name"]
+            kwargs = dict(
+                fast=fast,
+                stream=stream,
+                encoder=encoder,
+                max_expansion=max_expansion,
+                incremental=incremental,
+                loaded=loaded,
+                updater=updater,
+            )
+            if stream:
                 _, dependency_values = load_chart_with_dependencies(
-                    dependency_dir, root + [dependency_name]
+                    source.subchart(dependency_path), root + [dependency_name], **kwargs
+                )
+                return dependency_values
+
+            # load the chart outside of any namespace so it can be shared between aliases
+            def load():
+                _, rows = load_chart_with_dependencies(
+                    source.subchart(dependency_path), **kwargs
                 )
-                values = squash_duplicate_values(values + dependency_values)
+                return rows
+
+            key = (dependency["name"], source.digest(dependency_path))
+            prefix = "".join(part + "." for part in root + [dependency_name])
+            return [row.with_prefix(prefix) for row in loaded.load(key, load)]
+
+        # recursively update values by reading the helm charts in the charts/ folder,
+        # merging them in the declared order however they were loaded
+        if dep_jobs > 1 and len(resolved) > 1:
+            # streamed rows are read within the workers as well
+            with ThreadPoolExecutor(max_workers=dep_jobs) as executor:
+                dependencies_values = list(
+                    executor.map(lambda item: list(load_dependency(item)), resolved)
+                )
+        else:
+            dependencies_values = [
+                load_dependency(resolved_dependency) for resolved_dependency in resolved
+            ]
+        values = merge_values(values, *dependencies_values)
+        if not stream:
+            values = list(values)
 
     return chart, values
 
 
+class LoadedCharts:
+    """The rows of the dependency charts which have been loaded.
+
+    Charts are keyed by their name and a digest of their contents, so a chart which
+    several charts depend on or which is included under several aliases is loaded
+    once. Its rows are kept outside of any namespace to be prefixed for each use. If
+    several threads need a chart at once the first loads it and the rest wait.
+
+    """
+
+    def __init__(self):
+        self.charts = {}
+        self.lock = threading.Lock()
+
+    def load(self, key, load):
+        """Return the rows of a chart, loading them the first time it is needed.
+
+        Args:
+            key (tuple): The name and digest of the chart.
+            load (callable): Function returning the rows of the chart.
+
+        Returns:
+            list: Rows of the chart.
+
+        """
+        with self.lock:
+            future = self.charts.get(key)
+            owner = future is None
+            if owner:
+                future = self.charts[key] = Future()
+        if owner:
+            try:
+                future.set_result(list(load()))
+            except BaseException as e:
+                future.set_exception(e)
+        return future.result()
+
+
+def merge_values(*values):
+    """Merge value rows, keeping the first definition of each parameter.
+
+    Rows are yielded as they are consumed, so merging streamed values doesn't load
+    them all into memory.
+
+    Args:
+        *values (iterable): Iterables of value rows, in order of precedence.
+
+    Yields:
+        ValueRow(param, comment, value): The first row of each parameter.
+
+    """
+    seen = set()
+    for row in itertools.chain.from_iterable(values):
+        # Rows may also be plain lists, indexing a ValueRow doesn't serialize its default
+        param = row[0]
+        if param not in seen:
+            seen.add(param)
+            yield row
+
+
 def squash_duplicate_values(values):
     """Remove duplicates from values.
 
     If a value has already been defined remove future values.
 
     Args:
-        values (list): List of value tuples.
+        values (list): List of value rows.
+
+    Returns:
+        values (list): List of value rows with duplicated removed.
+
+    """
+    return list(merge_values(values))
+
+
+def fetch_dependencies(source, updater=None):
+    """Fetch the missing dependencies of a chart which isn't in a directory.
+
+    The files needed to load the chart are unpacked into a temporary directory for the
+    updater to fetch into, then read back into memory along with the dependencies it
+    fetched. This is used for packaged subcharts which don't bundle their dependencies.
+
+    Args:
+        source (frigate.sources.ChartSource): The chart.
+        updater (frigate.deps.HelmUpdater, optional): Updater shared by the run.
 
     Returns:
-        values (list): List of value tuples with duplicated removed.
+        frigate.sources.ArchiveSource: The chart with its dependencies in ``charts/``.
 
     """
-    tmp = {}
-    for item in values:
-        if item[0] not in tmp:
-            tmp[item[0]] = (item[1], item[2])
-    return [(key, tmp[key][0], tmp[key][1]) for key in tmp]
+    with tempfile.TemporaryDirectory() as tmpdir:
+        for name in chart_files(source):
+            path = os.path.join(tmpdir, *name.split("/"))
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, "wb") as fh:
+                fh.write(source.read(name))
+        update_chart_dependencies(tmpdir, updater)
+        unpacked = DirectorySource(tmpdir)
+        files = {name: unpacked.read(name) for name in chart_files(unpacked)}
+    return ArchiveSource(files, source.location)
 
 
-def update_chart_dependencies(chart_path):
+def update_chart_dependencies(chart_path, updater=None):
     """Update a helm charts local cache of dependencies.
 
     In order to generate a values table including dependencies we need
     all dependencies to be checked out locally. For each chart we are generating
-    values for we will call ``helm dep update <chart>``.
+    values for we will call ``helm dep build`` or ``helm dep update``, see
+    :class:`frigate.deps.HelmUpdater`.
 
     Args:
         chart_path (string): Path to the directory containing the helm chart
                              with dependencies to update to its charts/ folder.
+        updater (frigate.deps.HelmUpdater, optional): Updater shared by the run, which
+            only updates each chart once.
 
     """
-    if shutil.which("helm") is None:
-        raise RuntimeError(
-            "Unable to locate `helm` command which is needed for updating dependencies. "
-            "Please ensure `helm` is installed and available on the path. "
-            "Alternatively run frigate again with the `--no-deps` flag to skip generating "
-            "value table entried for dependencies."
-        )
-    subprocess.check_call(
-        ["helm", "dep", "update", "."],
-        cwd=chart_path,
-        stdout=subprocess.PIPE,
-        stderr=subprocess.PIPE,
-    )
+    if updater is None:
+        updater = HelmUpdater()
+    updater.update(chart_path)
     return None
 
 
@@ -147,17 +900,145 @@ def get_comment(tree, key):
         str: Comment
 
     """
-    comments = tree.ca.items[key]
-    linecol = tree.lc.data[key]
-    for comment in flatten(comments):
-        if isinstance(comment, str):
+    return _inline_comment(tree.ca.items[key], tree.lc.data[key][0])
+
+
+def comment_index(tree):
+    """Index the in-line comment of every key in a mapping.
+
+    Resolves the line of each commented key and walks its comment tokens once for the
+    whole mapping, so looking up the comment of each leaf while traversing is a single
+    dict lookup. Gives the same comments as :func:`get_comment`.
+
+    Args:
+        tree (ruamel.yaml.comments.CommentedMap): Mapping to index.
+
+    Returns:
+        dict: Mapping of keys to their comment, keys without a comment are omitted.
+
+    """
+    if isinstance(tree, CommentedDict):
+        return tree.comments
+    if not isinstance(tree, CommentedMap):
+        return {}
+    lines = tree.lc.data
+    index = {}
+    for key, comments in tree.ca.items.items():
+        comment = _inline_comment(comments, lines[key][0])
+        if comment:
+            index[key] = comment
+    return index
+
+
+def _inline_comment(comments, line):
+    """Return the cleaned comment from a nested list of tokens which starts on ``line``."""
+    pending = [comments]
+    while pending:
+        comment = pending.pop()
+        if type(comment) is list:
+            pending.extend(reversed(comment))
+        elif isinstance(comment, str):
             return clean_comment(comment)
-        if comment is not None and comment.start_mark.line == linecol[0]:
+        elif comment is not None and comment.start_mark.line == line:
             first_line = comment.value.strip().split("\n")[0]
             return clean_comment(first_line)
     return ""
 
 
+def scan_inline_comments(text):
+    """Find the in-line comment on each line of a YAML document.
+
+    A lightweight alternative to keeping ruamel.yaml's comment tokens around. A ``#`` starts
+    a comment when it follows whitespace outside of a quoted scalar, and only comments which
+    share a line with some content are collected. Block scalar bodies are not special cased
+    as those lines never hold a key.
+
+    Like the round-trip loader a comment only describes the first key on its line, so each
+    comment is returned along with the column that key starts at, and comments within flow
+    collections are skipped.
+
+    Examples:
+        Scan a document
+
+        >>> scan_inline_comments("# heading\\nhello: world  # this is the comment")
+        {1: (0, "this is the comment")}
+
+    Args:
+        text (str): YAML document.
+
+    Returns:
+        dict: Mapping of zero based line numbers to the key column and cleaned comment.
+
+    """
+    comments = {}
+    depth = 0
+    for lineno, line in enumerate(text.split("\n")):
+        if depth or _may_comment(line):
+            comment, depth = _line_comment(line, depth)
+            if comment is not None:
+                comments[lineno] = comment
+    return comments
+
+
+def _may_comment(line):
+    """Return whether a line may hold a comment or open a flow collection."""
+    return "#" in line or "[" in line or "{" in line
+
+
+def _line_comment(line, depth=0):
+    """Return the first key column and cleaned comment of a line, if it has a comment.
+
+    Also returns the depth of the flow collections still open at the end of the line,
+    given the ``depth`` open at its start.
+    """
+    index, depth, in_flow = _find_comment(line, depth)
+    if index is None or in_flow or not line[:index].strip():
+        return None, depth
+    column = len(line) - len(line.lstrip())
+    while line[column:column + 1] == "-" and line[column + 1:column + 2] in (" ", "\t"):
+        column += 1
+        column += len(line[column:]) - len(line[column:].lstrip())
+    return (column, clean_comment(line[index:].strip())), depth
+
+
+def _find_comment(line, depth=0):
+    """Return the index of the ``#`` which starts a comment on a line, if any.
+
+    Flow collections are tracked from the ``depth`` open at the start of the line, which
+    is returned for the end of the line along with whether the comment is within one.
+    """
+    quote = None
+    # Quotes only open a scalar at the start of a token, not within plain text like "don't"
+    opener = True
+    # A flow collection can't start a line at the top level, which guards block scalars
+    first = depth == 0
+    index = 0
+    while index < len(line):
+        char = line[index]
+        if quote is not None:
+            if char == "\\" and quote == '"':
+                index += 1
+            elif char == quote:
+                if quote == "'" and line[index + 1:index + 2] == "'":
+                    index += 1
+                else:
+                    quote = None
+        elif char == "#":
+            if index == 0 or line[index - 1] in " \t":
+                return index, depth, depth > 0
+        elif char in "'\"" and opener:
+            quote = char
+        elif char in "[{" and opener and not first:
+            depth += 1
+        elif char in "]}" and depth:
+            depth -= 1
+        if char not in " \t":
+            opener = quote is None and char in ":-?,[{"
+            first = False
+        index += 1
+    return None, depth, False
+
+
 def clean_comment(comment):
     """Remove comment formatting.
 
@@ -179,7 +1060,7 @@ def clean_comment(comment):
     return comment.strip("# ")
 
 
-def traverse(tree, root=None):
+def traverse(tree, root=None, encoder=None, max_expansion=MAX_EXPANSION):
     """Iterate over a tree of configuration and extract all information.
 
     Iterate over nested configuration and extract parameters, comments and values.
@@ -187,6 +1068,10 @@ def traverse(tree, root=None):
     Parameters will be fully namespaced. Descriptions will be extracted from the inline
     comment. Values will be taken as the default value.
 
+    Mappings which are shared through YAML aliases or merge keys are only traversed once,
+    their rows are replayed under each parameter which refers to them. Trees which would
+    expand by more than ``max_expansion`` nodes are rejected before traversing.
+
     Examples:
         Traversing the following YAML config would yield this list.
 
@@ -199,60 +1084,538 @@ def traverse(tree, root=None):
 
     Args:
         comment (ruamel.yaml.comments.CommentedMap): Tree of config to traverse.
-        root (list, optional): The root of the namespace we are currently at. Used for recursion.
+        root (list, optional): The root of the namespace to prefix parameters with.
+        encoder (callable, optional): Function to serialize default values with, see :class:`DefaultEncoder`.
+        max_expansion (int, optional): Maximum number of nodes aliases may add to the tree.
+
+    Raises:
+        ValueError: If the tree has recursive aliases or they add more than ``max_expansion`` nodes.
 
     Yields:
-        list(param, comment, value): Each namespaced parameter (str), the comment (str) and value (obj).
+        ValueRow(param, comment, value): Each namespaced parameter (str), the comment (str) and value (obj).
 
     """
-    if root is None:
-        root = []
-    for key in tree:
-        default = tree[key]
-        if isinstance(default, dict) and default != {}:
-            newroot = root + [key]
-            for value in traverse(default, root=newroot):
-                yield value
+    prefix = "".join(key + "." for key in root) if root else ""
+    shared = _check_expansion(tree, max_expansion)
+    return _traverse(tree, prefix, _encoder(encoder), shared, {})
+
+
+def alias_expansion(tree):
+    """Find the containers which are shared within a tree and the sizes of the tree.
+
+    YAML aliases and merge keys load as references to the same object, so a small
+    document can describe an exponentially large tree. This walks each container once
+    and counts the nodes the tree expands to without expanding it, along with the nodes
+    which were actually loaded. The difference between them is what aliases add.
+
+    Args:
+        tree (obj): Loaded values.
+
+    Raises:
+        ValueError: If a container contains itself through a recursive alias.
+
+    Returns:
+        shared (set): The ids of containers which are referenced more than once.
+        size (int): The number of nodes the tree expands to.
+        unique (int): The number of nodes loaded, counting each shared container once.
+
+    """
+    if not isinstance(tree, (dict, list)):
+        return set(), 1, 1
+    # A first cheap pass finds the shared containers, without any there is nothing to expand
+    seen = {id(tree)}
+    shared = set()
+    size = 1
+    stack = [tree]
+    while stack:
+        node = stack.pop()
+        # dict.values skips the Python level views of CommentedMap
+        for child in dict.values(node) if isinstance(node, dict) else node:
+            size += 1
+            if isinstance(child, (dict, list)):
+                if id(child) in seen:
+                    shared.add(id(child))
+                else:
+                    seen.add(id(child))
+                    stack.append(child)
+    if not shared:
+        return shared, size, size
+    unique = size
+
+    sizes = {}
+    visiting = set()
+    stack = [(tree, False)]
+    while stack:
+        node, visited = stack.pop()
+        children = dict.values(node) if isinstance(node, dict) else node
+        if visited:
+            visiting.discard(id(node))
+            sizes[id(node)] = 1 + sum(sizes.get(id(child), 1) for child in children)
+            continue
+        if id(node) in sizes:
+            continue
+        if id(node) in visiting:
+            raise ValueError("Values contain a recursive alias")
+        visiting.add(id(node))
+        stack.append((node, True))
+        stack.extend(
+            (child, False) for child in children if isinstance(child, (dict, list))
+        )
+    return shared, sizes[id(tree)], unique
+
+
+def _check_expansion(tree, max_expansion):
+    """Return the shared containers of ``tree``, raising if aliases add more than the limit."""
+    shared, size, unique = alias_expansion(tree)
+    # Only the nodes added by expanding aliases count, so large trees with a few small
+    # aliases aren't rejected
+    if shared and size - unique > max_expansion:
+        raise ValueError(
+            f"Aliases expand values by {size - unique} nodes, "
+            f"more than the limit of {max_expansion}"
+        )
+    return shared
+
+
+def _traverse(tree, prefix, encoder, shared=frozenset(), memo=None):
+    """Traverse ``tree`` without recursing, namespacing parameters under ``prefix``.
+
+    Each level of nesting pushes its mapping onto a stack along with its prefix and
+    :func:`comment_index`, which are built once per mapping and shared by all of the
+    leaves below it. The rows of mappings in ``shared`` are traversed once into ``memo``
+    and replayed under each prefix.
+    """
+    # dict.items skips the Python level lookups of CommentedMap
+    stack = [(iter(dict.items(tree)), prefix, comment_index(tree))]
+    while stack:
+        items, prefix, comments = stack[-1]
+        for key, default in items:
+            if isinstance(default, dict) and default != {}:
+                if id(default) in shared:
+                    rows = memo.get(id(default))
+                    if rows is None:
+                        rows = list(_traverse(default, "", encoder, shared, memo))
+                        memo[id(default)] = rows
+                    for row in rows:
+                        yield row.with_prefix(prefix + key + ".")
+                    continue
+                stack.append(
+                    (iter(dict.items(default)), prefix + key + ".", comment_index(default))
+                )
+                break
+            yield ValueRow(prefix + key, comments.get(key, ""), default, encoder)
         else:
-            if isinstance(default, list):
-                default = [
-                    (dict(item) if isinstance(item, CommentedMap) else item)
-                    for item in default
-                ]
-            if isinstance(default, CommentedMap):
-                default = dict(default)
-            comment = ""
-            if key in tree.ca.items:
-                comment = get_comment(tree, key)
-            param = ".".join(root + [key])
-            yield [param, comment, json.dumps(default)]
-
-
-def gen(chartdir, output_format, credits=True, deps=True):
+            stack.pop()
+
+
+def template_environment(source, enable_async=False, bytecode_cache=None):
+    """Return the jinja environment to render a chart's documentation with.
+
+    Environments are shared between every chart with the same template search path,
+    so templates are only loaded and compiled once per process. Templates from
+    directories are reloaded when their modification time changes. Compiled
+    templates are also kept in a bytecode cache on disk to be reused by other processes,
+    and the built-in templates are loaded precompiled when the package was built with
+    them, see :mod:`frigate.precompile`.
+
+    Args:
+        source (frigate.sources.ChartSource): The chart being documented.
+        enable_async (bool, optional): Compile templates to be rendered with ``render_async``.
+        bytecode_cache (bool, optional): Keep compiled templates in the on-disk cache. Defaults
+            to doing so unless the ``FRIGATE_NO_BYTECODE_CACHE`` environment variable is set.
+
+    Returns:
+        jinja2.Environment: The environment.
+
+    """
+    if bytecode_cache is None:
+        bytecode_cache = not os.environ.get(NO_BYTECODE_CACHE_ENV)
+    if isinstance(source, DirectorySource):
+        return _environment(os.path.abspath(source.path), enable_async=enable_async, bytecode_cache=bytecode_cache)
+    dotfile = None
+    if source.exists(DOTFILE_NAME):
+        dotfile = source.read(DOTFILE_NAME).decode("utf-8")
+    return _environment(None, dotfile, enable_async=enable_async, bytecode_cache=bytecode_cache)
+
+
+@functools.lru_cache(maxsize=64)
+def _environment(chartdir, dotfile=None, enable_async=False, bytecode_cache=True):
+    # Templates in the chart take precedence over the built-in ones
+    if chartdir is not None:
+        chart_loader = FileSystemLoader(chartdir)
+    else:
+        chart_loader = DictLoader({} if dotfile is None else {DOTFILE_NAME: dotfile})
+    # Precompiled templates can only be rendered synchronously
+    builtin = FileSystemLoader(TEMPLATES_PATH) if enable_async else builtin_loader()
+    return Environment(
+        loader=ChoiceLoader([chart_loader, builtin]),
+        bytecode_cache=(
+            _bytecode_cache("templates-async" if enable_async else "templates") if bytecode_cache else None
+        ),
+        enable_async=enable_async,
+    )
+
+
+@functools.lru_cache(maxsize=None)
+def _bytecode_cache(name="templates"):
+    # Async templates compile differently so are kept apart from the others
+    directory = os.path.join(default_cache_dir(), name)
+    try:
+        os.makedirs(directory, exist_ok=True)
+    except OSError:
+        return None
+    return FileSystemBytecodeCache(directory)
+
+
+def gen(
+    chartdir,
+    output_format,
+    credits=True,
+    deps=True,
+    fast=False,
+    cache=False,
+    stream=False,
+    encoder=None,
+    max_expansion=MAX_EXPANSION,
+    incremental=False,
+    dep_jobs=1,
+    updater=None,
+    rev=None,
+    output=None,
+):
     """Generate documentation for a Helm chart.
 
     Generate documentation for a Helm chart given the path to a chart and a
     format to write out in.
 
     Args:
-        chartdir (str): Path to Helm chart
-        output_format (str): Output format (maps to jinja templates in frigate)
+        chartdir (str or frigate.sources.ChartSource): Path to Helm chart directory or packaged `.tgz` chart
+        output_format (str or list): Output format (maps to jinja templates in frigate), or several
+            formats to render from a single load of the chart
         credits (bool): Show Frigate credits in documentation
         deps (bool): Read values from chart dependencies and include them in the config table
+        fast (bool): Parse with the safe loader and a line scanner for comments
+        cache (bool or frigate.cache.ChartCache): Reuse rows loaded by previous runs from the on-disk cache
+        stream (bool): Stream values from the values file rather than loading it all at once
+        encoder (callable): Function to serialize default values with, defaults to ``json.dumps``
+        max_expansion (int): Maximum number of nodes YAML aliases may add to values
+        incremental (bool or frigate.cache.ChartCache): Only re-parse the top-level blocks of values
+            files which changed since they were cached
+        dep_jobs (int): Number of chart dependencies to load at once
+        updater (frigate.deps.HelmUpdater): Fetches missing chart dependencies, shared between
+            charts so each is only updated once per run
+        rev (str): Read the chart from this git revision rather than the working tree
+        output (file or dict): Write the documentation to this file-like object as it is rendered,
+            rather than returning it. With several formats, a dict of files by format.
 
     Returns:
-        str: Rendered documentation for the Helm chart
+        str or dict: Rendered documentation for the Helm chart, or ``None`` if written to
+        ``output``. With several formats, a dict of the documentation by format.
 
     """
-    chart, values = (
-        load_chart_with_dependencies(chartdir) if deps else load_chart(chartdir)
+    source = _source(chartdir, rev)
+    chart, values = _load(
+        source,
+        deps=deps,
+        fast=fast,
+        cache=cache,
+        stream=stream,
+        encoder=encoder,
+        max_expansion=max_expansion,
+        incremental=incremental,
+        dep_jobs=dep_jobs,
+        updater=updater,
     )
+    if isinstance(output_format, str):
+        return _render(_template(source, output_format), chart, values, credits, output)
+
+    # Streamed values can only be iterated once
+    values = list(values)
+    return {
+        format: _render(
+            _template(source, format), chart, values, credits, (output or {}).get(format)
+        )
+        for format in output_format
+    }
+
+
+def gen_split(
+    chartdir,
+    output_format,
+    output_dir,
+    credits=True,
+    rev=None,
+    parts=None,
+    **load_kwargs,
+):
+    """Generate documentation for a Helm chart split into one file per top-level key.
+
+    Each top-level key of the values, which includes the root of each subchart, is
+    documented in its own ``<key>.<ext>`` file alongside a ``README.<ext>`` index which
+    links to them. Every part is rendered independently from the rows under its key and
+    files are only written when their contents change, so editing one section of a
+    large chart only rewrites its own part.
+
+    Args:
+        chartdir (str or frigate.sources.ChartSource): Path to Helm chart directory or packaged `.tgz` chart
+        output_format (str or list): Output format, or several formats to render from a
+            single load of the chart
+        output_dir (str): Directory to write the documentation to
+        credits (bool): Show Frigate credits in documentation
+        rev (str): Read the chart from this git revision rather than the working tree
+        parts (list): Only render the parts for these top-level keys, the index is always rendered
+        **load_kwargs: Options for loading the chart, as for :func:`gen`
+
+    Returns:
+        list: Paths of the files which were written.
+
+    Raises:
+        ValueError: If an output format can't be split.
+
+    """
+    formats = [output_format] if isinstance(output_format, str) else list(output_format)
+    for format in formats:
+        if format not in INDEX_RENDERERS:
+            raise ValueError(f"Unable to split documentation in the {format} format.")
+
+    source = _source(chartdir, rev)
+    chart, values = _load(source, **load_kwargs)
+    groups = group_values(values)
+    names = _part_names(groups)
+
+    os.makedirs(output_dir, exist_ok=True)
+    written = []
+    for format in formats:
+        extension = format_extension(format)
+        index = [
+            (key, f"{names[key]}.{extension}", len(rows)) for key, rows in groups.items()
+        ]
+        path = os.path.join(output_dir, f"README.{extension}")
+        chunks = INDEX_RENDERERS[format](chart, index, credits=credits)
+        if write_if_changed(path, lambda fh: fh.writelines(chunks)):
+            written.append(path)
+
+        template = _template(source, format)
+        for key, rows in groups.items():
+            if parts is not None and key not in parts:
+                continue
+            part_chart = dict(chart, name=f"{chart.get('name', '')} {key}")
+            path = os.path.join(output_dir, f"{names[key]}.{extension}")
+            if write_if_changed(
+                path, functools.partial(_render, template, part_chart, rows, credits)
+            ):
+                written.append(path)
+    return written
+
+
+def group_values(values):
+    """Group value rows by the top-level key of their parameter.
+
+    Args:
+        values (iterable): Traversed value rows.
+
+    Returns:
+        dict: Lists of rows by top-level key, in the order the keys first appear.
+
+    """
+    groups = {}
+    for row in values:
+        groups.setdefault(row.param.split(".", 1)[0], []).append(row)
+    return groups
+
+
+def _part_names(keys):
+    # Keys can contain anything, so make safe and distinct file names from them
+    names = {}
+    taken = {"README"}
+    for key in keys:
+        name = re.sub(r"[^A-Za-z0-9_.-]", "_", key).strip(".") or "_"
+        candidate = name
+        suffix = 1
+        while candidate in taken:
+            suffix += 1
+            candidate = f"{name}-{suffix}"
+        taken.add(candidate)
+        names[key] = candidate
+    return names
 
-    templates = Environment(loader=FileSystemLoader([chartdir, TEMPLATES_PATH]))
-    if os.path.isfile(os.path.join(chartdir, DOTFILE_NAME)):
+
+async def gen_async(
+    chartdir,
+    output_format,
+    credits=True,
+    rev=None,
+    output=None,
+    executor=None,
+    **load_kwargs,
+):
+    """Generate documentation for a Helm chart without blocking the event loop.
+
+    The asyncio counterpart of :func:`gen`. The chart is loaded with
+    :func:`load_chart_async` and rendered with an async jinja environment, so many
+    charts can be documented concurrently by a single event loop. Cancelling the task
+    kills any helm command it is running.
+
+    Args:
+        chartdir (str or frigate.sources.ChartSource): Path to Helm chart directory or packaged `.tgz` chart
+        output_format (str or list): Output format (maps to jinja templates in frigate), or several
+            formats to render from a single load of the chart
+        credits (bool): Show Frigate credits in documentation
+        rev (str): Read the chart from this git revision rather than the working tree
+        output (file or dict): Write the documentation to this file-like object as it is rendered,
+            rather than returning it. Its ``write`` may be a coroutine function. With several
+            formats, a dict of files by format.
+        executor (concurrent.futures.Executor): Executor to read and parse charts in,
+            defaults to the event loop's default executor
+        **load_kwargs: Options for loading the chart, as for :func:`gen`
+
+    Returns:
+        str or dict: Rendered documentation for the Helm chart, or ``None`` if written to
+        ``output``. With several formats, a dict of the documentation by format.
+
+    """
+    loop = asyncio.get_running_loop()
+    source = await loop.run_in_executor(executor, _source, chartdir, rev)
+    chart, values = await load_chart_async(source, executor=executor, **load_kwargs)
+    formats = [output_format] if isinstance(output_format, str) else output_format
+    docs = {}
+    for format in formats:
+        template = await loop.run_in_executor(
+            executor, functools.partial(_template, source, format, enable_async=True)
+        )
+        if isinstance(output_format, str):
+            sink = output
+        else:
+            sink = (output or {}).get(format)
+        docs[format] = await _render_async(template, chart, values, credits, sink, executor)
+    return docs[output_format] if isinstance(output_format, str) else docs
+
+
+async def load_chart_async(chartdir, rev=None, executor=None, **load_kwargs):
+    """Load a chart and its values without blocking the event loop.
+
+    Missing dependencies of the chart are fetched with asyncio subprocesses when the
+    updater supports it, see :meth:`frigate.deps.HelmUpdater.update_async`. Reading
+    and parsing the chart is run in an executor.
+
+    Args:
+        chartdir (str or frigate.sources.ChartSource): Path to Helm chart directory or packaged `.tgz` chart
+        rev (str): Read the chart from this git revision rather than the working tree
+        executor (concurrent.futures.Executor): Executor to read and parse the chart in,
+            defaults to the event loop's default executor
+        **load_kwargs: Options for loading the chart, as for :func:`gen`
+
+    Returns:
+        chart (dict): Contents of `Chart.yaml` loaded into a dict.
+        values (list): Traversed value rows.
+
+    """
+    loop = asyncio.get_running_loop()
+    source = await loop.run_in_executor(executor, _source, chartdir, rev)
+    if load_kwargs.get("deps", True) and isinstance(source, DirectorySource):
+        updater = load_kwargs["updater"] = load_kwargs.get("updater") or HelmUpdater()
+        if await loop.run_in_executor(executor, missing_dependencies, source.path):
+            if hasattr(updater, "update_async"):
+                await updater.update_async(source.path)
+            else:
+                await loop.run_in_executor(executor, updater.update, source.path)
+
+    def load():
+        chart, values = _load(source, **load_kwargs)
+        # Streamed values are read in the executor too, rather than by the event loop
+        return chart, list(values)
+
+    return await loop.run_in_executor(executor, load)
+
+
+def _source(chartdir, rev=None):
+    if rev is None:
+        return chart_source(chartdir)
+    return git_source(chartdir, rev)
+
+
+def _load(
+    source,
+    deps=True,
+    fast=False,
+    cache=False,
+    stream=False,
+    encoder=None,
+    max_expansion=MAX_EXPANSION,
+    incremental=False,
+    dep_jobs=1,
+    updater=None,
+):
+    loader = (
+        functools.partial(
+            load_chart_with_dependencies, dep_jobs=dep_jobs, updater=updater
+        )
+        if deps
+        else load_chart
+    )
+    if incremental and not isinstance(incremental, ChartCache):
+        incremental = ChartCache()
+    kwargs = dict(
+        fast=fast,
+        stream=stream,
+        encoder=encoder,
+        max_expansion=max_expansion,
+        incremental=incremental,
+    )
+    encoder_name = _encoder_name(encoder)
+    if cache and encoder_name is not None:
+        if not isinstance(cache, ChartCache):
+            cache = ChartCache()
+        return cache.load(loader, source, deps, encoder_name, max_expansion, **kwargs)
+    return loader(source, **kwargs)
+
+
+def _template(source, output_format, enable_async=False):
+    # Built-in formats are rendered natively unless the chart has its own template
+    if source.exists(DOTFILE_NAME):
         template_name = DOTFILE_NAME
+    elif output_format in RENDERERS:
+        return RENDERERS[output_format]
     else:
         template_name = f"{output_format}.jinja2"
-    template = templates.get_template(template_name)
+    return template_environment(source, enable_async=enable_async).get_template(template_name)
 
-    return template.render(**chart, values=values, credits=credits)
+
+def _render(template, chart, values, credits, output=None):
+    if not isinstance(template, Template):
+        chunks = template(chart, values, credits=credits)
+        if output is None:
+            return "".join(chunks)
+        for chunk in chunks:
+            output.write(chunk)
+        return None
+    if output is None:
+        return template.render(**chart, values=values, credits=credits)
+    for chunk in template.generate(**chart, values=values, credits=credits):
+        output.write(chunk)
+
+
+async def _render_async(template, chart, values, credits, output=None, executor=None):
+    if not isinstance(template, Template):
+        # Native renderers are synchronous so run them in the executor, a batch of
+        # chunks at a time when they're written to the output on the event loop
+        loop = asyncio.get_running_loop()
+        chunks = template(chart, values, credits=credits)
+        if output is None:
+            return await loop.run_in_executor(executor, "".join, chunks)
+        while True:
+            batch = await loop.run_in_executor(
+                executor, list, itertools.islice(chunks, RENDER_BATCH_SIZE)
+            )
+            if not batch:
+                return None
+            for chunk in batch:
+                written = output.write(chunk)
+                if inspect.isawaitable(written):
+                    await written
+    if output is None:
+        return await template.render_async(**chart, values=values, credits=credits)
+    async for chunk in template.generate_async(**chart, values=values, credits=credits):
+        written = output.write(chunk)
+        if inspect.isawaitable(written):
+            await written
@@ -1,7 +1,10 @@
+import functools
 import os
-from pathlib import Path
 
+from frigate.deps import missing_dependencies
+from frigate.fetch import FETCH_TIMEOUT, get_updater
 from frigate.gen import gen
+from frigate.utils import write_if_changed
 
 """[pre-commit-hook]
 Add features, fix bugs locally with :
@@ -16,7 +19,20 @@ Note : pre-commit creates a virtualenv with the hook
 """
 
 
-def main(output_file, format, credits=True, deps=True):
+def main(
+    output_file,
+    format,
+    credits=True,
+    deps=True,
+    fast=False,
+    cache=False,
+    stream=False,
+    incremental=False,
+    dep_jobs=1,
+    helm_timeout=None,
+    fetch="helm",
+    fetch_timeout=FETCH_TIMEOUT,
+):
     """Write a README file for discovered Helm chart(s).
 
 
@@ -25,6 +41,15 @@ def main(output_file, format, credits=True, deps=True):
         output_format (str): Output format (maps to jinja templates in frigate)
         credits (bool): Show Frigate credits in documentation
         deps (bool): Read values from chart dependencies and include them in the config table
+        fast (bool): Parse with the safe loader and a line scanner for comments
+        cache (bool): Reuse rows loaded by previous runs from the on-disk cache
+        stream (bool): Stream values from the values file rather than loading it all at once
+        incremental (bool): Only re-parse the top-level blocks of values files which changed
+        dep_jobs (int): Number of chart dependencies to load at once, and of charts to fetch
+            missing dependencies for at once
+        helm_timeout (float): Seconds to allow each helm command to run for
+        fetch (str): Fetch missing dependencies with ``helm`` or the ``native`` fetcher
+        fetch_timeout (float): Seconds the ``native`` fetcher waits on a repository for each request
 
     Returns:
         int: How many files were updated by the hook
@@ -42,16 +67,36 @@ def main(output_file, format, credits=True, deps=True):
         if name in files:
             charts.append(os.path.join(root, name))
 
+    # Fetch the missing dependencies of every chart up front, once each
+    updater = get_updater(fetch, helm_timeout=helm_timeout, jobs=dep_jobs, fetch_timeout=fetch_timeout)
+    if deps:
+        updater.update_all(
+            [
+                os.path.dirname(chart)
+                for chart in charts
+                if missing_dependencies(os.path.dirname(chart))
+            ]
+        )
+
     # For each chart
     for chart in charts:
         chart_location = os.path.dirname(chart)
-        frigate_output = gen(chart_location, format, credits=credits, deps=deps)
-        artifact = Path(chart_location, output_file)
-        Path(artifact).touch()
-        with open(artifact, "r") as before:
-            current_output = before.read()
-        if current_output != frigate_output:
+        render = functools.partial(
+            gen,
+            chart_location,
+            format,
+            credits=credits,
+            deps=deps,
+            fast=fast,
+            cache=cache,
+            stream=stream,
+            incremental=incremental,
+            dep_jobs=dep_jobs,
+            updater=updater,
+        )
+        if write_if_changed(
+            os.path.join(chart_location, output_file),
+            lambda generated: render(output=generated),
+        ):
             retval += 1
-            with open(artifact, "w") as generated:
-                generated.write(frigate_output)
     return retval
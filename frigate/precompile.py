@@ -0,0 +1,84 @@
+"""Precompile the built-in templates so processes needn't compile them at runtime."""
+import hashlib
+import os
+
+import jinja2
+from jinja2 import Environment, FileSystemLoader, ModuleLoader
+
+from frigate import TEMPLATES_PATH
+
+COMPILED_TEMPLATES_PATH = os.path.join(os.path.dirname(__file__), "compiled_templates")
+
+# Records the jinja version the templates were compiled with, as compiled templates
+# are only compatible with the version of jinja which compiled them, along with a
+# hash of the source templates they were compiled from
+VERSION_MARKER = "jinja_version.txt"
+
+
+def templates_hash(path=None):
+    """Hash the contents of the source templates.
+
+    Args:
+        path (str, optional): Directory holding the source templates. Defaults to the
+            built-in ones.
+
+    Returns:
+        str: Hex digest of the names and contents of the templates.
+
+    """
+    path = path or TEMPLATES_PATH
+    digest = hashlib.sha256()
+    for name in sorted(os.listdir(path)):
+        with open(os.path.join(path, name), "rb") as fh:
+            contents = fh.read()
+        digest.update(name.encode("utf-8") + b"\0" + contents + b"\0")
+    return digest.hexdigest()
+
+
+def compile_templates(target=COMPILED_TEMPLATES_PATH):
+    """Compile the built-in templates into Python modules.
+
+    This is run when the package is built, and can be rerun after editing the templates.
+
+    Args:
+        target (str, optional): Directory to write the compiled templates to.
+
+    """
+    os.makedirs(target, exist_ok=True)
+    environment = Environment(loader=FileSystemLoader(TEMPLATES_PATH))
+    environment.compile_templates(target, zip=None)
+    with open(os.path.join(target, VERSION_MARKER), "w") as fh:
+        fh.write(f"{jinja2.__version__}\n{templates_hash()}\n")
+
+
+def compiled_loader(path=None):
+    """Return a loader for the precompiled built-in templates if they can be used.
+
+    The compiled templates are only used when they were compiled by the installed
+    version of jinja from the current source templates, which may have been edited
+    since in a development checkout.
+
+    Args:
+        path (str, optional): Directory holding the compiled templates. Defaults to the
+            ones built into the package.
+
+    Returns:
+        jinja2.ModuleLoader: The loader, or ``None`` if the source templates should be used.
+
+    """
+    path = path or COMPILED_TEMPLATES_PATH
+    marker = os.path.join(path, VERSION_MARKER)
+    try:
+        with open(marker, "r") as fh:
+            compiled = fh.read().split()
+        sources = templates_hash()
+    except OSError:
+        return None
+    if compiled != [jinja2.__version__, sources]:
+        return None
+    return ModuleLoader(path)
+
+
+def builtin_loader():
+    """Return the loader for the built-in templates, preferring the precompiled ones."""
+    return compiled_loader() or FileSystemLoader(TEMPLATES_PATH)
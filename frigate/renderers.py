@@ -0,0 +1,277 @@
+"""Render the built-in output formats without jinja.
+
+Each renderer produces exactly the same output as the template of the same name in
+``frigate/templates``, but formats the values table with plain Python which is much
+faster for large charts. They are used in place of the templates unless the chart
+has a ``.frigate`` template of its own.
+
+The index renderers produce the page linking to each part of documentation which
+has been split by top-level key, see :func:`frigate.gen.gen_split`.
+
+"""
+
+CREDITS_URL = "https://frigate.readthedocs.io"
+
+
+def _text(chart, key):
+    # Matches how jinja prints a variable, where missing ones are empty
+    return str(chart.get(key, ""))
+
+
+def render_markdown(chart, values, credits=True):
+    """Render documentation as markdown, like ``markdown.jinja2``.
+
+    Args:
+        chart (dict): Contents of `Chart.yaml`.
+        values (iterable): Traversed value rows.
+        credits (bool, optional): Show Frigate credits in documentation.
+
+    Yields:
+        str: Chunks of the documentation.
+
+    """
+    name = _text(chart, "name").capitalize()
+    yield (
+        f"\n{name}\n===========\n\n"
+        f"{_text(chart, 'description')}\n\n{_text(chart, 'long_description')}\n"
+        "## Configuration\n\n"
+        f"The following table lists the configurable parameters of the {name} chart "
+        "and their default values.\n\n"
+        "| Parameter                | Description             | Default        |\n"
+        "| ------------------------ | ----------------------- | -------------- |\n"
+    )
+    for param, comment, default in values:
+        yield "| `%s` | %s | `%s` |\n" % (param, comment, default)
+    yield f"\n{_text(chart, 'footnotes')}\n\n"
+    if credits:
+        yield f"---\n_Documentation generated by [Frigate]({CREDITS_URL})._"
+    yield "\n"
+
+
+def render_rst(chart, values, credits=True):
+    """Render documentation as reStructuredText, like ``rst.jinja2``.
+
+    Args:
+        chart (dict): Contents of `Chart.yaml`.
+        values (iterable): Traversed value rows.
+        credits (bool, optional): Show Frigate credits in documentation.
+
+    Yields:
+        str: Chunks of the documentation.
+
+    """
+    name = _text(chart, "name").capitalize()
+    yield (
+        ".. This page has been autogenerated using Frigate.\n"
+        f"   {CREDITS_URL}\n\n"
+        f"{name}\n======================\n\n"
+        f"{_text(chart, 'description')}\n\n{_text(chart, 'long_description')}\n\n"
+        "Configuration\n-------------\n\n"
+        f"The following table lists the configurable parameters of the {name} chart "
+        "and their default values.\n\n"
+        ".. list-table::\n"
+        "   :header-rows: 1\n"
+        "   :stub-columns: 1\n\n"
+        "   * - Parameter\n"
+        "     - Description\n"
+        "     - Default\n"
+    )
+    for param, comment, default in values:
+        yield "\n\n\n   * - %-50s\n     - %-100s\n     - %-50s\n" % (
+            "``" + param + "``",
+            comment,
+            "``%s``" % (default,),
+        )
+    yield f"\n\n{_text(chart, 'footnotes')}\n\n"
+    if credits:
+        yield (
+            "----\n\n"
+            "Documentation generated by Frigate_.\n\n"
+            f".. _Frigate: {CREDITS_URL}\n"
+        )
+    yield "\n"
+
+
+def render_html(chart, values, credits=True):
+    """Render documentation as HTML, like ``html.jinja2``.
+
+    Args:
+        chart (dict): Contents of `Chart.yaml`.
+        values (iterable): Traversed value rows.
+        credits (bool, optional): Show Frigate credits in documentation.
+
+    Yields:
+        str: Chunks of the documentation.
+
+    """
+    name = _text(chart, "name").capitalize()
+    yield (
+        "<html>\n"
+        f"<!-- This page has been autogenerated using Frigate. {CREDITS_URL} -->\n"
+        "<head>\n"
+        f"  <title>{name}</title>\n"
+        "</head>\n"
+        "<body>\n\n"
+        f"<h1>\n  {name}\n</h1>\n\n"
+        f"<p>\n  {_text(chart, 'description')}\n</p>\n\n"
+        f"<p>\n  {_text(chart, 'long_description')}\n</p>\n\n"
+        "<h2>\n  Configuration\n</h2>\n\n"
+        "<p>\n"
+        f"  The following table lists the configurable parameters of the {name} chart "
+        "and their default values.\n"
+        "</p>\n\n"
+        '<table style="width:100%">\n'
+        "  <tr>\n"
+        "    <th>Parameter</th>\n"
+        "    <th>Description</th>\n"
+        "    <th>Default</th>\n"
+        "  </tr>\n"
+        "  "
+    )
+    for param, comment, default in values:
+        yield (
+            "<tr>\n"
+            "    <td><code>%s</code></td>\n"
+            "    <td>%s</td>\n"
+            "    <td><code>%s</code></td>\n"
+            "  </tr>\n"
+            "  "
+        ) % (param, comment, default)
+    yield f"</table>\n\n<p>\n  {_text(chart, 'footnotes')}\n</p>\n\n"
+    if credits:
+        yield (
+            "<hr />\n"
+            f'<p><i>Documentation generated by <a href="{CREDITS_URL}">Frigate</a>.</i></p>'
+        )
+    yield "\n</body>\n</html>\n"
+
+
+def render_markdown_index(chart, parts, credits=True):
+    """Render the index of split documentation as markdown.
+
+    Args:
+        chart (dict): Contents of `Chart.yaml`.
+        parts (list): The ``(key, filename, rows)`` of each part, where ``rows`` is the
+            number of parameters in it.
+        credits (bool, optional): Show Frigate credits in documentation.
+
+    Yields:
+        str: Chunks of the documentation.
+
+    """
+    name = _text(chart, "name").capitalize()
+    yield (
+        f"{name}\n===========\n\n"
+        f"{_text(chart, 'description')}\n\n{_text(chart, 'long_description')}\n\n"
+        "## Configuration\n\n"
+        f"The configurable parameters of the {name} chart are documented by their top-level key.\n\n"
+        "| Key | Parameters |\n"
+        "| --- | ---------- |\n"
+    )
+    for key, filename, rows in parts:
+        yield f"| [`{key}`]({filename}) | {rows} |\n"
+    yield f"\n{_text(chart, 'footnotes')}\n\n"
+    if credits:
+        yield f"---\n_Documentation generated by [Frigate]({CREDITS_URL})._\n"
+
+
+def render_rst_index(chart, parts, credits=True):
+    """Render the index of split documentation as reStructuredText.
+
+    Args:
+        chart (dict): Contents of `Chart.yaml`.
+        parts (list): The ``(key, filename, rows)`` of each part, where ``rows`` is the
+            number of parameters in it.
+        credits (bool, optional): Show Frigate credits in documentation.
+
+    Yields:
+        str: Chunks of the documentation.
+
+    """
+    name = _text(chart, "name").capitalize()
+    yield (
+        ".. This page has been autogenerated using Frigate.\n"
+        f"   {CREDITS_URL}\n\n"
+        f"{name}\n======================\n\n"
+        f"{_text(chart, 'description')}\n\n{_text(chart, 'long_description')}\n\n"
+        "Configuration\n-------------\n\n"
+        f"The configurable parameters of the {name} chart are documented by their top-level key.\n\n"
+        ".. list-table::\n"
+        "   :header-rows: 1\n\n"
+        "   * - Key\n"
+        "     - Parameters\n"
+    )
+    for key, filename, rows in parts:
+        yield f"   * - `{key} <{filename}>`__\n     - {rows}\n"
+    yield f"\n{_text(chart, 'footnotes')}\n\n"
+    if credits:
+        yield (
+            "----\n\n"
+            "Documentation generated by Frigate_.\n\n"
+            f".. _Frigate: {CREDITS_URL}\n"
+        )
+
+
+def render_html_index(chart, parts, credits=True):
+    """Render the index of split documentation as HTML.
+
+    Args:
+        chart (dict): Contents of `Chart.yaml`.
+        parts (list): The ``(key, filename, rows)`` of each part, where ``rows`` is the
+            number of parameters in it.
+        credits (bool, optional): Show Frigate credits in documentation.
+
+    Yields:
+        str: Chunks of the documentation.
+
+    """
+    name = _text(chart, "name").capitalize()
+    yield (
+        "<html>\n"
+        f"<!-- This page has been autogenerated using Frigate. {CREDITS_URL} -->\n"
+        "<head>\n"
+        f"  <title>{name}</title>\n"
+        "</head>\n"
+        "<body>\n\n"
+        f"<h1>\n  {name}\n</h1>\n\n"
+        f"<p>\n  {_text(chart, 'description')}\n</p>\n\n"
+        f"<p>\n  {_text(chart, 'long_description')}\n</p>\n\n"
+        "<h2>\n  Configuration\n</h2>\n\n"
+        "<p>\n"
+        f"  The configurable parameters of the {name} chart are documented by their top-level key.\n"
+        "</p>\n\n"
+        '<table style="width:100%">\n'
+        "  <tr>\n"
+        "    <th>Key</th>\n"
+        "    <th>Parameters</th>\n"
+        "  </tr>\n"
+    )
+    for key, filename, rows in parts:
+        yield (
+            "  <tr>\n"
+            f'    <td><a href="{filename}"><code>{key}</code></a></td>\n'
+            f"    <td>{rows}</td>\n"
+            "  </tr>\n"
+        )
+    yield f"</table>\n\n<p>\n  {_text(chart, 'footnotes')}\n</p>\n\n"
+    if credits:
+        yield (
+            "<hr />\n"
+            f'<p><i>Documentation generated by <a href="{CREDITS_URL}">Frigate</a>.</i></p>\n'
+        )
+    yield "</body>\n</html>\n"
+
+
+#: Native renderers for the built-in output formats, by format.
+RENDERERS = {
+    "markdown": render_markdown,
+    "rst": render_rst,
+    "html": render_html,
+}
+
+#: Renderers for the index of split documentation, by format.
+INDEX_RENDERERS = {
+    "markdown": render_markdown_index,
+    "rst": render_rst_index,
+    "html": render_html_index,
+}
@@ -0,0 +1,489 @@
+"""Read the files of a chart from a directory, a packaged archive or a git revision."""
+import abc
+import atexit
+import gzip
+import hashlib
+import io
+import os
+import posixpath
+import re
+import subprocess
+import tarfile
+import threading
+
+from frigate import DOTFILE_NAME
+
+# Files needed to load a chart, relative to the root of the chart or of a subchart
+# which has been unpacked into its charts/ folder
+CHART_FILE_PATTERN = re.compile(
+    r"^(?:charts/[^/]+/)*(?:Chart\.yaml|Chart\.lock|values\.yaml|charts/[^/]+\.tgz)$"
+)
+
+
+class ChartSource(abc.ABC):
+    """The files of a Helm chart.
+
+    Files are named by their ``/`` separated path relative to the root of the chart.
+
+    """
+
+    #: Description of where the chart was read from, used in messages and cache keys.
+    location = None
+
+    @abc.abstractmethod
+    def open(self, name):
+        """Open a file of the chart for reading in binary mode.
+
+        Args:
+            name (str): Path of the file within the chart.
+
+        Returns:
+            file: The opened file.
+
+        Raises:
+            FileNotFoundError: If the chart has no such file.
+
+        """
+
+    @abc.abstractmethod
+    def listdir(self, name):
+        """List the names of the entries in a folder of the chart.
+
+        Args:
+            name (str): Path of the folder within the chart.
+
+        Returns:
+            list: Sorted names of the entries, empty if there is no such folder.
+
+        """
+
+    @abc.abstractmethod
+    def isdir(self, name):
+        """Return whether a folder exists in the chart."""
+
+    def read(self, name):
+        """Read the contents of a file of the chart as bytes."""
+        with self.open(name) as fh:
+            return fh.read()
+
+    def open_text(self, name):
+        """Open a file of the chart for reading as text."""
+        return io.TextIOWrapper(self.open(name), encoding="utf-8")
+
+    def exists(self, name):
+        """Return whether a file exists in the chart."""
+        try:
+            self.open(name).close()
+        except FileNotFoundError:
+            return False
+        return True
+
+    def describe(self, name):
+        """Describe where a file of the chart was read from."""
+        return posixpath.join(self.location, name)
+
+    def digest(self, name):
+        """Identify the contents of a file, or the location of a folder, in the chart.
+
+        Args:
+            name (str): Path of the file or folder within the chart.
+
+        Returns:
+            str: Hex digest of the file's contents, or the location of the folder.
+
+        """
+        if self.isdir(name):
+            return self.describe(name)
+        digest = hashlib.sha256()
+        with self.open(name) as fh:
+            for block in iter(lambda: fh.read(1024 * 1024), b""):
+                digest.update(block)
+        return digest.hexdigest()
+
+    def subchart(self, name):
+        """Return the source of a subchart which is either unpacked or packaged.
+
+        Args:
+            name (str): Path of the subchart folder or ``.tgz`` archive within the chart.
+
+        Returns:
+            ChartSource: The subchart.
+
+        """
+        if self.isdir(name):
+            return self._subdirectory(name)
+        with self.open(name) as fh:
+            return ArchiveSource.from_file(fh, self.describe(name))
+
+    @abc.abstractmethod
+    def _subdirectory(self, name):
+        """Return the source of an unpacked subchart folder."""
+
+
+class DirectorySource(ChartSource):
+    """A chart which has been unpacked into a directory.
+
+    Args:
+        path (str): Path to the chart directory.
+
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.location = path
+
+    def _path(self, name):
+        return os.path.join(self.path, *name.split("/"))
+
+    def open(self, name):
+        return open(self._path(name), "rb")
+
+    def open_text(self, name):
+        return open(self._path(name), "r")
+
+    def listdir(self, name):
+        try:
+            return sorted(os.listdir(self._path(name)))
+        except (FileNotFoundError, NotADirectoryError):
+            return []
+
+    def isdir(self, name):
+        return os.path.isdir(self._path(name))
+
+    def exists(self, name):
+        return os.path.isfile(self._path(name))
+
+    def describe(self, name):
+        return os.path.abspath(self._path(name))
+
+    def _subdirectory(self, name):
+        return DirectorySource(self._path(name))
+
+
+class ArchiveSource(ChartSource):
+    """A packaged chart read into memory.
+
+    Only the files needed to load the chart and its dependencies are kept, see
+    :func:`read_archive`.
+
+    Args:
+        files (dict): Contents of the files by their path within the chart.
+        location (str): Description of where the archive was read from.
+
+    """
+
+    def __init__(self, files, location):
+        self.files = files
+        self.location = location
+
+    @classmethod
+    def from_file(cls, fh, location, templates=False):
+        """Read a chart from an opened ``.tgz`` archive.
+
+        Args:
+            fh (file): The archive opened in binary mode.
+            location (str): Description of where the archive was read from.
+            templates (bool, optional): Also read the chart's frigate template, see :func:`read_archive`.
+
+        Returns:
+            ArchiveSource: The chart.
+
+        """
+        return cls(read_archive(fh, templates=templates), location)
+
+    @classmethod
+    def from_path(cls, path, templates=False):
+        """Read a chart from the path to a ``.tgz`` archive."""
+        with open(path, "rb") as fh:
+            return cls.from_file(fh, os.path.abspath(path), templates=templates)
+
+    def open(self, name):
+        try:
+            return io.BytesIO(self.files[name])
+        except KeyError:
+            raise FileNotFoundError(f"No such file in {self.location}: {name}") from None
+
+    def listdir(self, name):
+        prefix = name.rstrip("/") + "/"
+        return sorted(
+            {path[len(prefix):].split("/")[0] for path in self.files if path.startswith(prefix)}
+        )
+
+    def isdir(self, name):
+        prefix = name.rstrip("/") + "/"
+        return any(path.startswith(prefix) for path in self.files)
+
+    def exists(self, name):
+        return name in self.files
+
+    def _subdirectory(self, name):
+        prefix = name.rstrip("/") + "/"
+        files = {
+            path[len(prefix):]: data for path, data in self.files.items() if path.startswith(prefix)
+        }
+        return ArchiveSource(files, self.describe(name))
+
+
+def read_archive(fh, templates=False):
+    """Read the files needed to load a chart out of a ``.tgz`` archive.
+
+    The archive is decompressed as a stream and only ``Chart.yaml``, ``Chart.lock``,
+    ``values.yaml`` and the dependencies in ``charts/`` are kept in memory, so large
+    ``files/`` or CRD folders are skipped over rather than written to disk. Reading
+    stops as soon as ``Chart.yaml`` and ``values.yaml`` have been found if the chart has
+    no dependencies, which helm places at the start of the archives it packages.
+
+    Args:
+        fh (file): The archive opened in binary mode.
+        templates (bool, optional): Also keep the ``.frigate`` template at the root of the
+            chart, which means reading the whole archive as it could be anywhere.
+
+    Returns:
+        dict: Contents of the files by their path relative to the root of the chart.
+
+    Raises:
+        tarfile.TarError: If the archive can't be read.
+
+    """
+    files = {}
+    # Read through gzip as tarfile's stream mode can't skip the extra header helm writes
+    with gzip.open(fh, "rb") as gz, tarfile.open(fileobj=gz, mode="r|") as archive:
+        for member in archive:
+            if not member.isfile():
+                continue
+            _, _, name = re.sub(r"^(?:\./)+", "", member.name).partition("/")
+            if not CHART_FILE_PATTERN.match(name) and not (
+                templates and name == DOTFILE_NAME
+            ):
+                continue
+            files[name] = archive.extractfile(member).read()
+            if (
+                not templates
+                and "Chart.yaml" in files
+                and "values.yaml" in files
+                and b"dependencies" not in files["Chart.yaml"]
+            ):
+                break
+    return files
+
+
+def chart_files(source):
+    """List the files needed to load a chart and its dependencies.
+
+    These are the files :func:`read_archive` keeps, found by walking ``charts/`` and the
+    ``charts/`` folders of any unpacked subcharts.
+
+    Args:
+        source (ChartSource): The chart.
+
+    Returns:
+        list: Paths of the files within the chart, in a stable order.
+
+    """
+    names = []
+    pending = [""]
+    while pending:
+        folder = pending.pop(0)
+        for name in ["Chart.yaml", "Chart.lock", "values.yaml"]:
+            if source.exists(folder + name):
+                names.append(folder + name)
+        for entry in source.listdir(folder + "charts"):
+            name = f"{folder}charts/{entry}"
+            if source.isdir(name):
+                pending.append(name + "/")
+            elif CHART_FILE_PATTERN.match(name):
+                names.append(name)
+    return names
+
+
+def chart_source(chart):
+    """Return the source of a chart.
+
+    Args:
+        chart (str or ChartSource): Path to a chart directory or packaged ``.tgz`` chart.
+
+    Returns:
+        ChartSource: The chart.
+
+    """
+    if isinstance(chart, ChartSource):
+        return chart
+    if os.path.isfile(chart):
+        return ArchiveSource.from_path(chart, templates=True)
+    return DirectorySource(chart)
+
+
+class GitRepository:
+    """A git repository read through a single long-lived ``git cat-file --batch`` process.
+
+    Use :meth:`for_path` to share one process between every chart read from the
+    repository during a run.
+
+    Args:
+        path (str): Path to the top level of the repository.
+
+    """
+
+    _repositories = {}
+    _toplevels = {}
+    _repositories_lock = threading.Lock()
+
+    def __init__(self, path):
+        self.path = path
+        self.process = None
+        self.lock = threading.Lock()
+
+    @classmethod
+    def for_path(cls, path):
+        """Return the shared repository containing a directory.
+
+        The top level of the repository is only looked up once per directory.
+
+        Args:
+            path (str): Path to a directory within the repository.
+
+        Returns:
+            GitRepository: The repository.
+
+        """
+        path = os.path.abspath(path)
+        with cls._repositories_lock:
+            toplevel = cls._toplevels.get(path)
+        if toplevel is None:
+            toplevel = subprocess.run(
+                ["git", "rev-parse", "--show-toplevel"],
+                cwd=path,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.PIPE,
+                check=True,
+            ).stdout.decode().strip()
+        with cls._repositories_lock:
+            cls._toplevels[path] = toplevel
+            repository = cls._repositories.get(toplevel)
+            if repository is None:
+                if not cls._repositories:
+                    atexit.register(cls.close_all)
+                repository = cls._repositories[toplevel] = cls(toplevel)
+        return repository
+
+    @classmethod
+    def close_all(cls):
+        """Stop the processes of every shared repository."""
+        with cls._repositories_lock:
+            repositories = list(cls._repositories.values())
+        for repository in repositories:
+            repository.close()
+
+    def read(self, name):
+        """Read an object from the repository.
+
+        Args:
+            name (str): Name of the object, such as ``<commit>:<path>``.
+
+        Returns:
+            tuple: The object's ``(sha, type, content)`` or ``None`` if it doesn't exist.
+
+        """
+        with self.lock:
+            if self.process is None or self.process.poll() is not None:
+                self.process = subprocess.Popen(
+                    ["git", "cat-file", "--batch"],
+                    cwd=self.path,
+                    stdin=subprocess.PIPE,
+                    stdout=subprocess.PIPE,
+                )
+            self.process.stdin.write(name.encode() + b"\n")
+            self.process.stdin.flush()
+            header = self.process.stdout.readline()
+            if header.endswith((b" missing\n", b" ambiguous\n")):
+                return None
+            sha, object_type, size = header.split()
+            content = self.process.stdout.read(int(size))
+            self.process.stdout.read(1)
+        return sha.decode(), object_type.decode(), content
+
+    def close(self):
+        """Stop the ``git cat-file`` process."""
+        with self.lock:
+            if self.process is not None:
+                self.process.stdin.close()
+                self.process.wait()
+                self.process = None
+
+
+class GitSource(ChartSource):
+    """A chart read from a commit in a git repository without checking it out.
+
+    Args:
+        repository (GitRepository): The repository.
+        commit (str): Hash of the commit to read the chart from.
+        path (str): Path of the chart within the repository.
+
+    """
+
+    def __init__(self, repository, commit, path):
+        self.repository = repository
+        self.commit = commit
+        self.path = path
+        self.location = f"{commit}:{path}"
+
+    def _object(self, name):
+        path = posixpath.normpath(posixpath.join(self.path, name))
+        return self.repository.read(f"{self.commit}:{'' if path == '.' else path}")
+
+    def open(self, name):
+        found = self._object(name)
+        if found is None or found[1] != "blob":
+            raise FileNotFoundError(f"No such file in {self.location}: {name}")
+        return io.BytesIO(found[2])
+
+    def listdir(self, name):
+        found = self._object(name)
+        if found is None or found[1] != "tree":
+            return []
+        sha_size = len(found[0]) // 2
+        names = []
+        content = found[2]
+        index = 0
+        while index < len(content):
+            end = content.index(b"\0", index)
+            names.append(content[index:end].split(b" ", 1)[1].decode())
+            index = end + 1 + sha_size
+        return sorted(names)
+
+    def isdir(self, name):
+        found = self._object(name)
+        return found is not None and found[1] == "tree"
+
+    def exists(self, name):
+        found = self._object(name)
+        return found is not None and found[1] == "blob"
+
+    def _subdirectory(self, name):
+        return GitSource(self.repository, self.commit, posixpath.join(self.path, name))
+
+
+def git_source(path, rev):
+    """Return the source of a chart at a revision of the git repository it is in.
+
+    Args:
+        path (str): Path to the chart, which needn't exist in the working tree.
+        rev (str): The revision to read the chart from, such as a commit or branch.
+
+    Returns:
+        GitSource: The chart.
+
+    Raises:
+        ValueError: If the revision doesn't exist.
+
+    """
+    path = os.path.realpath(path)
+    directory = path
+    while not os.path.isdir(directory):
+        directory = os.path.dirname(directory)
+    repository = GitRepository.for_path(directory)
+    found = repository.read(f"{rev}^{{commit}}")
+    if found is None:
+        raise ValueError(f"Unknown git revision {rev!r}")
+    relative = os.path.relpath(path, repository.path).replace(os.sep, "/")
+    return GitSource(repository, found[0], relative)
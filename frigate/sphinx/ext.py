@@ -2,7 +2,7 @@ import os
 
 from docutils import nodes
 from docutils.parsers import rst
-from docutils.parsers.rst.directives import unchanged
+from docutils.parsers.rst.directives import flag, positive_int, unchanged
 from docutils.statemachine import ViewList
 from sphinx.util.nodes import nested_parse_with_titles
 
@@ -14,6 +14,10 @@ class FrigateDirective(rst.Directive):
     required_arguments = 1
     option_spec = {
         'output_format': unchanged,
+        'fast': flag,
+        'cache': flag,
+        'incremental': flag,
+        'dep_jobs': positive_int,
     }
 
     def run(self):
@@ -23,7 +27,14 @@ class FrigateDirective(rst.Directive):
         )
         if self.options.get('output_format') is None:
             self.options.update({'output_format': 'rst'})
-        output = ViewList(gen(chart_path, output_format=self.options.get('output_format')).split("\n"))
+        output = ViewList(gen(
+            chart_path,
+            output_format=self.options.get('output_format'),
+            fast='fast' in self.options,
+            cache='cache' in self.options,
+            incremental='incremental' in self.options,
+            dep_jobs=self.options.get('dep_jobs', 1),
+        ).split("\n"))
 
         node = nodes.section()
         node.document = self.state.document
@@ -0,0 +1,17 @@
+import os
+
+import pytest
+
+
+@pytest.fixture(autouse=True)
+def template_cache(tmp_path, monkeypatch):
+    import frigate.gen
+
+    # Keep compiled templates out of the user's cache
+    monkeypatch.setenv("XDG_CACHE_HOME", str(tmp_path / "cache"))
+    monkeypatch.delenv("FRIGATE_NO_BYTECODE_CACHE", raising=False)
+    frigate.gen._bytecode_cache.cache_clear()
+    frigate.gen._environment.cache_clear()
+    yield os.path.join(tmp_path, "cache", "frigate", "templates")
+    frigate.gen._bytecode_cache.cache_clear()
+    frigate.gen._environment.cache_clear()
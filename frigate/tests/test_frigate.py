@@ -1,3 +1,4 @@
+import json
 import os
 import os.path
 
@@ -152,6 +153,39 @@ def test_custom_template(rich_chart_path):
     assert test_phrase in gen(rich_chart_path, "markdown")
 
 
+def test_template_environment(rich_chart_path, tmp_path, template_cache):
+    import shutil
+
+    from frigate.gen import gen, template_environment
+    from frigate.sources import chart_source
+
+    chartdir = tmp_path / "rich"
+    shutil.copytree(rich_chart_path, chartdir)
+    environment = template_environment(chart_source(str(chartdir)))
+    assert "rich chart" in gen(str(chartdir), "markdown")
+    assert template_environment(chart_source(str(chartdir))) is environment
+    assert os.listdir(template_cache)
+
+    dotfile = chartdir / ".frigate"
+    dotfile.write_text(dotfile.read_text().replace("rich chart", "edited chart"))
+    mtime = os.path.getmtime(dotfile) + 10
+    os.utime(dotfile, (mtime, mtime))
+    assert "edited chart" in gen(str(chartdir), "markdown")
+
+
+def test_no_bytecode_cache(rich_chart_path, monkeypatch, template_cache):
+    from frigate.gen import gen, template_environment
+    from frigate.sources import chart_source
+
+    source = chart_source(rich_chart_path)
+    assert template_environment(source, bytecode_cache=False).bytecode_cache is None
+
+    monkeypatch.setenv("FRIGATE_NO_BYTECODE_CACHE", "1")
+    assert template_environment(source).bytecode_cache is None
+    assert "rich chart" in gen(rich_chart_path, "markdown")
+    assert not os.path.exists(template_cache)
+
+
 def test_deps(deps_chart_path):
     from frigate.gen import gen
 
@@ -162,6 +196,553 @@ def test_deps(deps_chart_path):
     assert "mainline" in tag_line
 
 
+@pytest.mark.parametrize(
+    "version,constraint,expected",
+    [
+        ("1.2.3", "1.2.3", True),
+        ("1.2.9", "~1.2.3", True),
+        ("1.3.0", "~1.2.3", False),
+        ("1.9.0", "^1.2", True),
+        ("0.3.0", "^0.2.3", False),
+        ("1.2.7", "1.2.x", True),
+        ("1.5.0", "1.2 - 1.4", False),
+        ("2.0.0", "<1.0 || >=2.0", True),
+        ("1.5.0", ">= 1.2, < 2", True),
+        ("1.0.0-rc.1", "*", False),
+        ("1.0.0-rc.1", ">=1.0.0-rc.0", True),
+    ],
+)
+def test_version_matches(version, constraint, expected):
+    from frigate.deps import version_matches
+
+    assert version_matches(version, constraint) is expected
+
+
+def package_chart(name, files):
+    import io
+    import tarfile
+
+    data = io.BytesIO()
+    with tarfile.open(fileobj=data, mode="w:gz") as archive:
+        for path, contents in files.items():
+            info = tarfile.TarInfo(f"{name}/{path}")
+            info.size = len(contents)
+            archive.addfile(info, io.BytesIO(contents))
+    return data.getvalue()
+
+
+def test_resolve_dependencies(tmp_path, monkeypatch):
+    import frigate.gen
+
+    with open(os.path.join(MODULE_ROOT, "tests", "mockcharts", "simple", "values.yaml"), "rb") as fh:
+        simple_values = fh.read()
+    chartdir = tmp_path / "chart"
+    (chartdir / "charts").mkdir(parents=True)
+    for version in ["1.0.0", "1.1.0", "2.0.0"]:
+        archive = package_chart(
+            "simple", {"Chart.yaml": f"name: simple\nversion: {version}\n".encode(), "values.yaml": simple_values}
+        )
+        (chartdir / "charts" / f"simple-{version}.tgz").write_bytes(archive)
+    (chartdir / "Chart.yaml").write_text(
+        "name: parent\nversion: 0.1.0\ndependencies:\n"
+        "  - name: simple\n    version: ^1.0.0\n"
+        "  - name: simple\n    version: 2.x\n    alias: other\n"
+    )
+    (chartdir / "values.yaml").write_text("replicas: 1\n")
+
+    resolved = frigate.gen.resolve_dependencies(
+        str(chartdir), frigate.gen.yaml.load((chartdir / "Chart.yaml").read_text())["dependencies"]
+    )
+    assert [os.path.basename(path) for _, path in resolved] == [
+        "simple-1.1.0.tgz",
+        "simple-2.0.0.tgz",
+    ]
+    (chartdir / "Chart.lock").write_text("dependencies:\n  - name: simple\n    version: 1.0.0\n")
+    resolved = frigate.gen.resolve_dependencies(
+        str(chartdir), [{"name": "simple", "version": "^1.0.0"}]
+    )
+    assert os.path.basename(resolved[0][1]) == "simple-1.0.0.tgz"
+
+    def fail(chart_path):
+        raise AssertionError("helm should not be needed")
+
+    monkeypatch.setattr(frigate.gen, "update_chart_dependencies", fail)
+    _, values = frigate.gen.load_chart_with_dependencies(str(chartdir))
+    params = [row[0] for row in values]
+    assert "simple.image.repository" in params
+    assert "other.image.repository" in params
+
+
+def test_concurrent_dependencies(tmp_path):
+    import frigate.gen
+
+    chartdir = tmp_path / "chart"
+    (chartdir / "charts").mkdir(parents=True)
+    names = [f"sub{i}" for i in range(6)]
+    for name in names:
+        archive = package_chart(
+            name,
+            {
+                "Chart.yaml": f"name: {name}\nversion: 1.0.0\n".encode(),
+                "values.yaml": f"value: {name}  # from {name}\nshared: {name}\n".encode(),
+            },
+        )
+        (chartdir / "charts" / f"{name}-1.0.0.tgz").write_bytes(archive)
+    (chartdir / "Chart.yaml").write_text(
+        "name: parent\nversion: 0.1.0\ndependencies:\n"
+        + "".join(f"  - name: {name}\n    version: 1.0.0\n" for name in reversed(names))
+    )
+    (chartdir / "values.yaml").write_text("replicas: 1\n")
+
+    _, values = frigate.gen.load_chart_with_dependencies(str(chartdir))
+    _, concurrent_values = frigate.gen.load_chart_with_dependencies(str(chartdir), dep_jobs=4)
+    assert concurrent_values == values
+    assert [row[0] for row in values] == ["replicas"] + [
+        f"{name}.{key}" for name in reversed(names) for key in ["value", "shared"]
+    ]
+
+
+def test_shared_dependencies(tmp_path, monkeypatch):
+    import frigate.gen
+
+    def chart_yaml(name, *dependencies):
+        text = f"name: {name}\nversion: 1.0.0\n"
+        if dependencies:
+            text += "dependencies:\n"
+        for dependency, alias in dependencies:
+            text += f"  - name: {dependency}\n    version: 1.0.0\n"
+            if alias:
+                text += f"    alias: {alias}\n"
+        return text.encode()
+
+    common = package_chart(
+        "common",
+        {"Chart.yaml": chart_yaml("common"), "values.yaml": b"labels: {}  # labels\n"},
+    )
+    chartdir = tmp_path / "chart"
+    (chartdir / "charts").mkdir(parents=True)
+    for name in ["api", "web"]:
+        archive = package_chart(
+            name,
+            {
+                "Chart.yaml": chart_yaml(name, ("common", None)),
+                "values.yaml": b"port: 80\n",
+                "charts/common-1.0.0.tgz": common,
+            },
+        )
+        (chartdir / "charts" / f"{name}-1.0.0.tgz").write_bytes(archive)
+    (chartdir / "charts" / "common-1.0.0.tgz").write_bytes(common)
+    (chartdir / "Chart.yaml").write_bytes(
+        chart_yaml(
+            "parent",
+            ("api", None),
+            ("web", None),
+            ("common", "first"),
+            ("common", "second"),
+        )
+    )
+    (chartdir / "values.yaml").write_text("replicas: 1\n")
+
+    loads = []
+    load_chart = frigate.gen.load_chart
+
+    def counting_load_chart(chartdir, *args, **kwargs):
+        loads.append(chartdir.location)
+        return load_chart(chartdir, *args, **kwargs)
+
+    monkeypatch.setattr(frigate.gen, "load_chart", counting_load_chart)
+    _, values = frigate.gen.load_chart_with_dependencies(str(chartdir), dep_jobs=2)
+    assert [tuple(row) for row in values] == [
+        ("replicas", "", "1"),
+        ("api.port", "", "80"),
+        ("api.common.labels", "labels", "{}"),
+        ("web.port", "", "80"),
+        ("web.common.labels", "labels", "{}"),
+        ("first.labels", "labels", "{}"),
+        ("second.labels", "labels", "{}"),
+    ]
+    # the parent, api, web and a single load of common
+    assert len(loads) == 4
+
+
+@pytest.fixture
+def leaf_updater():
+    # Fetches a leaf chart into the charts it updates
+    leaf = package_chart("leaf", {"Chart.yaml": b"name: leaf\nversion: 1.0.0\n", "values.yaml": b"c: 3\n"})
+
+    class Updater:
+        def __init__(self):
+            self.updated = []
+
+        def update(self, chart_path):
+            self.updated.append(chart_path)
+            os.makedirs(os.path.join(chart_path, "charts"), exist_ok=True)
+            with open(os.path.join(chart_path, "charts", "leaf-1.0.0.tgz"), "wb") as fh:
+                fh.write(leaf)
+
+    return Updater()
+
+
+def test_nested_subchart_updater(tmp_path, monkeypatch, leaf_updater):
+    from frigate.gen import load_chart_with_dependencies
+
+    chartdir = tmp_path / "chart"
+    subchart = chartdir / "charts" / "sub"
+    subchart.mkdir(parents=True)
+    (chartdir / "Chart.yaml").write_text(
+        "name: parent\nversion: 1.0.0\ndependencies:\n  - name: sub\n    version: 1.0.0\n"
+    )
+    (chartdir / "values.yaml").write_text("a: 1\n")
+    (subchart / "Chart.yaml").write_text(
+        "name: sub\nversion: 1.0.0\ndependencies:\n  - name: leaf\n    version: 1.0.0\n"
+    )
+    (subchart / "values.yaml").write_text("b: 2\n")
+
+    # Only the given updater may fetch dependencies
+    monkeypatch.setenv("PATH", "")
+    _, values = load_chart_with_dependencies(str(chartdir), updater=leaf_updater)
+    assert [tuple(row) for row in values] == [("a", "", "1"), ("sub.b", "", "2"), ("sub.leaf.c", "", "3")]
+    assert leaf_updater.updated == [str(subchart)]
+
+
+def test_packaged_subchart_missing_dependencies(tmp_path, leaf_updater):
+    from frigate.gen import load_chart_with_dependencies
+
+    sub = package_chart(
+        "sub",
+        {
+            "Chart.yaml": b"name: sub\nversion: 1.0.0\ndependencies:\n  - name: leaf\n    version: 1.0.0\n",
+            "values.yaml": b"b: 2\n",
+        },
+    )
+    chartdir = tmp_path / "chart"
+    (chartdir / "charts").mkdir(parents=True)
+    (chartdir / "charts" / "sub-1.0.0.tgz").write_bytes(sub)
+    (chartdir / "Chart.yaml").write_text(
+        "name: parent\nversion: 1.0.0\ndependencies:\n  - name: sub\n    version: 1.0.0\n"
+    )
+    (chartdir / "values.yaml").write_text("a: 1\n")
+
+    # The archive is unpacked for the updater, then read back into memory
+    _, values = load_chart_with_dependencies(str(chartdir), updater=leaf_updater)
+    assert [tuple(row) for row in values] == [("a", "", "1"), ("sub.b", "", "2"), ("sub.leaf.c", "", "3")]
+    assert len(leaf_updater.updated) == 1
+    assert not os.path.exists(leaf_updater.updated[0])
+
+
+def test_archive_source(deps_chart_path, tmp_path):
+    import tarfile
+
+    from frigate.gen import load_chart_with_dependencies
+    from frigate.sources import ArchiveSource
+
+    archive_path = tmp_path / "deps-0.1.0.tgz"
+    with tarfile.open(archive_path, "w:gz") as archive:
+        archive.add(deps_chart_path, "deps")
+    source = ArchiveSource.from_path(str(archive_path))
+
+    assert sorted(source.files) == [
+        "Chart.yaml",
+        "charts/simple-0.1.0.tgz",
+        "values.yaml",
+    ]
+    assert source.listdir("charts") == ["simple-0.1.0.tgz"]
+    assert sorted(source.subchart("charts/simple-0.1.0.tgz").files) == [
+        "Chart.yaml",
+        "values.yaml",
+    ]
+    assert load_chart_with_dependencies(source) == load_chart_with_dependencies(
+        deps_chart_path
+    )
+
+
+def test_merge_values(deps_chart_path):
+    from frigate.gen import load_chart_with_dependencies, merge_values
+
+    rows = merge_values(iter([("a", "", "1"), ("b", "", "2")]), iter([("a", "", "3"), ("c", "", "4")]))
+    assert next(rows) == ("a", "", "1")
+    assert list(rows) == [("b", "", "2"), ("c", "", "4")]
+
+    _, streamed = load_chart_with_dependencies(deps_chart_path, stream=True)
+    assert not isinstance(streamed, list)
+    assert list(streamed) == load_chart_with_dependencies(deps_chart_path)[1]
+
+
+@pytest.fixture()
+def fake_helm(tmp_path, monkeypatch):
+    bindir = tmp_path / "bin"
+    bindir.mkdir()
+    log = tmp_path / "helm.log"
+    helm = bindir / "helm"
+    helm.write_text(
+        "#!/bin/sh\n"
+        f'echo "$*" >> {log}\n'
+        'case "$HELM_MODE" in\n'
+        "  fail) echo boom >&2; exit 1;;\n"
+        "  slow) exec sleep 5;;\n"
+        "esac\n"
+    )
+    helm.chmod(0o755)
+    monkeypatch.setenv("PATH", f"{bindir}{os.pathsep}{os.environ['PATH']}")
+    return log
+
+
+def test_helm_updater(tmp_path, fake_helm, monkeypatch):
+    from frigate.deps import HelmUpdater
+
+    chartdir = tmp_path / "chart"
+    chartdir.mkdir()
+    (chartdir / "Chart.yaml").write_text(
+        "name: parent\nversion: 0.1.0\ndependencies:\n"
+        "  - name: simple\n    version: ^0.1.0\n    repository: https://example.com\n"
+    )
+    updater = HelmUpdater()
+    updater.update_all([str(chartdir), str(chartdir)])
+    updater.update(str(chartdir))
+    assert fake_helm.read_text().splitlines() == ["dep update ."]
+
+    (chartdir / "Chart.lock").write_text(
+        "dependencies:\n  - name: simple\n    version: 0.1.2\n    repository: https://example.com\n"
+    )
+    updater.update(str(chartdir))
+    assert fake_helm.read_text().splitlines() == ["dep update .", "dep build ."]
+
+    monkeypatch.setenv("HELM_MODE", "fail")
+    with pytest.raises(RuntimeError, match="boom"):
+        HelmUpdater().update(str(chartdir))
+
+    monkeypatch.setenv("HELM_MODE", "slow")
+    with pytest.raises(RuntimeError, match="timed out"):
+        HelmUpdater(timeout=0.1).update(str(chartdir))
+
+    updater = HelmUpdater()
+    updater.cancel()
+    with pytest.raises(RuntimeError, match="cancelled"):
+        updater.update(str(chartdir))
+
+
+@pytest.fixture()
+def chart_repository(deps_chart_path):
+    import hashlib
+    import http.server
+    import threading
+
+    with open(os.path.join(deps_chart_path, "charts", "simple-0.1.0.tgz"), "rb") as fh:
+        archive = fh.read()
+    index = (
+        "apiVersion: v1\nentries:\n  simple:\n"
+        "  - name: simple\n    version: 0.2.0-rc.1\n    urls: [simple-0.2.0-rc.1.tgz]\n"
+        "  - name: simple\n    version: 0.1.0\n    urls: [charts/simple-0.1.0.tgz]\n"
+        f"    digest: {hashlib.sha256(archive).hexdigest()}\n"
+    ).encode()
+    files = {"/index.yaml": index, "/charts/simple-0.1.0.tgz": archive}
+    requests = []
+    connections = set()
+
+    class Handler(http.server.BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def do_GET(self):
+            requests.append((self.path, self.headers.get("If-None-Match")))
+            connections.add(self.client_address)
+            if self.path == "/index.yaml" and self.headers.get("If-None-Match") == '"v1"':
+                self.send_response(304)
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+                return
+            body = files.get(self.path)
+            self.send_response(404 if body is None else 200)
+            self.send_header("Content-Length", str(len(body or b"")))
+            self.send_header("ETag", '"v1"')
+            self.end_headers()
+            self.wfile.write(body or b"")
+
+        def log_message(self, *args):
+            pass
+
+    server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_address[1]}", requests, connections
+    server.shutdown()
+    server.server_close()
+
+
+def test_chart_fetcher(chart_repository, tmp_path):
+    from frigate.fetch import ChartFetcher
+    from frigate.gen import load_chart_with_dependencies
+
+    url, requests, connections = chart_repository
+    charts = []
+    for name in ["one", "two"]:
+        chartdir = tmp_path / name
+        chartdir.mkdir()
+        (chartdir / "Chart.yaml").write_text(
+            f"name: {name}\nversion: 0.1.0\ndependencies:\n"
+            f"  - name: simple\n    version: ~0.1.0\n    repository: {url}/\n"
+        )
+        (chartdir / "values.yaml").write_text("replicas: 1\n")
+        charts.append(str(chartdir))
+
+    fetcher = ChartFetcher(cache_dir=str(tmp_path / "cache"), jobs=1)
+    fetcher.update_all(charts)
+    assert sorted(os.listdir(tmp_path / "one" / "charts")) == ["simple-0.1.0.tgz"]
+    assert [path for path, _ in requests].count("/index.yaml") == 1
+    assert len(connections) == 1
+    # Downloads for every chart share the fetcher's threads
+    executor = fetcher.executor
+    os.remove(tmp_path / "one" / "charts" / "simple-0.1.0.tgz")
+    fetcher.update(charts[0])
+    assert fetcher.executor is executor
+
+    # A later run revalidates the cached index rather than downloading it again
+    requests.clear()
+    _, values = load_chart_with_dependencies(
+        charts[0], updater=ChartFetcher(cache_dir=str(tmp_path / "cache"))
+    )
+    assert "simple.image.repository" in [row[0] for row in values]
+    assert requests == []
+    os.remove(tmp_path / "one" / "charts" / "simple-0.1.0.tgz")
+    ChartFetcher(cache_dir=str(tmp_path / "cache")).update(charts[0])
+    assert requests == [("/index.yaml", '"v1"'), ("/charts/simple-0.1.0.tgz", None)]
+
+
+def test_get_updater():
+    from frigate.deps import HelmUpdater
+    from frigate.fetch import FETCH_TIMEOUT, get_updater
+
+    assert isinstance(get_updater("helm"), HelmUpdater)
+    assert get_updater("native").pool.timeout == FETCH_TIMEOUT
+    assert get_updater("native", fetch_timeout=5).pool.timeout == 5
+
+
+@pytest.mark.parametrize("chart_name", ["rich", "deps"])
+def test_gen_archive(chart_name, tmp_path):
+    import tarfile
+
+    from frigate.cache import ChartCache
+    from frigate.gen import gen
+
+    chartdir = os.path.join(MODULE_ROOT, "tests", "mockcharts", chart_name)
+    archive_path = str(tmp_path / f"{chart_name}-0.1.0.tgz")
+    with tarfile.open(archive_path, "w:gz") as archive:
+        archive.add(chartdir, chart_name)
+
+    docs = gen(chartdir, "markdown")
+    assert gen(archive_path, "markdown") == docs
+    cache = ChartCache(str(tmp_path / "cache"))
+    assert gen(archive_path, "markdown", cache=cache) == docs
+    assert gen(archive_path, "markdown", cache=cache) == docs
+
+
+def test_gen_rev(tmp_path, monkeypatch):
+    import shutil
+    import subprocess
+
+    from frigate.gen import gen
+    from frigate.sources import GitRepository
+
+    def git(*args):
+        subprocess.run(
+            ["git", "-c", "user.name=frigate", "-c", "user.email=frigate@example.com", *args],
+            cwd=tmp_path,
+            check=True,
+            stdout=subprocess.PIPE,
+        )
+
+    for name in ["rich", "deps"]:
+        shutil.copytree(os.path.join(MODULE_ROOT, "tests", "mockcharts", name), tmp_path / name)
+    git("init", "-q")
+    git("add", ".")
+    git("commit", "-q", "-m", "Add charts")
+    expected = {name: gen(str(tmp_path / name), "markdown") for name in ["rich", "deps"]}
+    (tmp_path / "rich" / "values.yaml").write_text("changed: true\n")
+    shutil.rmtree(tmp_path / "deps")
+    git("commit", "-q", "-am", "Change charts")
+
+    for name in ["rich", "deps"]:
+        assert gen(str(tmp_path / name), "markdown", rev="HEAD~1") == expected[name]
+    assert "changed" in gen(str(tmp_path / "rich"), "markdown", rev="HEAD")
+    # Every chart is read through the same git process
+    repository = GitRepository.for_path(str(tmp_path / "rich"))
+    assert GitRepository.for_path(str(tmp_path)) is repository
+    pid = repository.process.pid
+    # Nor is the top level of the repository looked up again
+    monkeypatch.setattr(subprocess, "run", None)
+    gen(str(tmp_path / "rich"), "markdown", rev="HEAD~1")
+    assert repository.process.pid == pid
+    monkeypatch.undo()
+    with pytest.raises(ValueError, match="Unknown git revision"):
+        gen(str(tmp_path / "rich"), "markdown", rev="missing")
+
+
+def test_gen_output(simple_chart_path, tmp_path):
+    import io
+
+    from click.testing import CliRunner
+
+    from frigate.cli import cli
+    from frigate.gen import gen
+
+    expected = gen(simple_chart_path, "markdown")
+    output = io.StringIO()
+    assert gen(simple_chart_path, "markdown", output=output) is None
+    assert output.getvalue() == expected
+
+    result = CliRunner().invoke(cli, ["gen", simple_chart_path, "--output", str(tmp_path / "README.md")])
+    assert result.exit_code == 0
+    assert (tmp_path / "README.md").read_text() == expected
+
+
+def test_gen_formats(simple_chart_path, tmp_path, monkeypatch):
+    from click.testing import CliRunner
+
+    import frigate.gen
+    from frigate.cli import cli
+    from frigate.gen import gen
+
+    expected = {format: gen(simple_chart_path, format) for format in ["markdown", "rst", "html"]}
+    loads = []
+    load_chart = frigate.gen.load_chart_with_dependencies
+    monkeypatch.setattr(
+        frigate.gen,
+        "load_chart_with_dependencies",
+        lambda *args, **kwargs: loads.append(args) or load_chart(*args, **kwargs),
+    )
+    assert gen(simple_chart_path, ["markdown", "rst", "html"], stream=True) == expected
+    assert len(loads) == 1
+
+    args = ["gen", simple_chart_path, "-o", "markdown", "-o", "rst", "-o", "html"]
+    assert CliRunner().invoke(cli, args).exit_code != 0
+    result = CliRunner().invoke(cli, args + ["--output-dir", str(tmp_path / "docs")])
+    assert result.exit_code == 0
+    assert (tmp_path / "docs" / "README.md").read_text() == expected["markdown"]
+    assert (tmp_path / "docs" / "README.rst").read_text() == expected["rst"]
+    assert (tmp_path / "docs" / "README.html").read_text() == expected["html"]
+
+
+@pytest.mark.parametrize("output_format", ["markdown", "rst", "html"])
+@pytest.mark.parametrize("chart_name", ["simple", "deps"])
+def test_native_renderers(chart_name, output_format, template_cache):
+    from frigate.gen import load_chart_with_dependencies, template_environment
+    from frigate.renderers import RENDERERS
+    from frigate.sources import chart_source
+    from frigate.utils import ValueRow
+
+    chart_path = os.path.join(MODULE_ROOT, "tests", "mockcharts", chart_name)
+    chart, values = load_chart_with_dependencies(chart_path)
+    template = template_environment(chart_source(chart_path)).get_template(f"{output_format}.jinja2")
+    render = RENDERERS[output_format]
+    for credits in (True, False):
+        expected = template.render(**chart, values=values, credits=credits)
+        assert "".join(render(chart, values, credits=credits)) == expected
+
+    odd_chart = {"name": None, "description": 3, "footnotes": "100% {x}"}
+    odd_values = [ValueRow("a" * 60, "50%s off", None), ValueRow("b", "", "{}")]
+    expected = template.render(**odd_chart, values=odd_values, credits=True)
+    assert "".join(render(odd_chart, odd_values)) == expected
+
+
 def test_squash_duplicates():
     from frigate.gen import squash_duplicate_values
 
@@ -169,3 +750,617 @@ def test_squash_duplicates():
 
     assert len(values) == 1
     assert values[0][2] == "world"
+
+
+@pytest.mark.parametrize("chart_name", ["simple", "rich", "deps"])
+def test_fast_load_chart(chart_name):
+    from frigate.gen import load_chart
+
+    chart_path = os.path.join(MODULE_ROOT, "tests", "mockcharts", chart_name)
+    chart, values = load_chart(chart_path)
+    fast_chart, fast_values = load_chart(chart_path, fast=True)
+
+    assert fast_chart == chart
+    assert fast_values == values
+
+
+def test_fast_load_comments(yaml):
+    from frigate.gen import fast_load, traverse
+
+    text = """
+# heading  # not a comment
+hello: world  # this is the comment
+quoted: "a # b"  # after the quote
+single: 'it''s # here'  # after the escape
+plain: don't # mind the apostrophe
+hash: a#b
+pipe: | # pipe string.
+  world  # part of the string
+nested:
+  key: value  # nested comment
+"""
+    assert list(traverse(fast_load(text))) == list(traverse(yaml.load(text)))
+
+
+@pytest.mark.parametrize(
+    "text",
+    [
+        "a: &x 5\nb: *x  # bx\n",
+        "l: &l [1, 2]  # lc\ny: *l # yc\n",
+        "a: &x 5  # ac\nb:\n  c: *x  # cc\n  d: 1  # dc\n",
+    ],
+)
+def test_alias_comments(yaml, tmp_path, text):
+    from frigate.gen import fast_load, stream_values, traverse
+
+    expected = list(traverse(yaml.load(text)))
+    values_path = tmp_path / "values.yaml"
+    values_path.write_text(text)
+    assert list(traverse(fast_load(text))) == expected
+    assert list(stream_values(str(values_path))) == expected
+
+
+@pytest.mark.parametrize(
+    "text",
+    [
+        "a: [1, # c\n  2]\n",
+        "a: {\n  b: 1, # c\n  d: 2}\nz: 3  # z\n",
+        "a: [1, 2]  # c\nb: |\n  [x, # c\nd: 1  # d\n",
+    ],
+)
+def test_flow_comments(yaml, tmp_path, text):
+    from frigate.gen import fast_load, stream_values, traverse
+
+    expected = list(traverse(yaml.load(text)))
+    values_path = tmp_path / "values.yaml"
+    values_path.write_text(text)
+    assert list(traverse(fast_load(text))) == expected
+    assert list(stream_values(str(values_path))) == expected
+
+
+def test_cache(simple_chart_path, tmp_path, monkeypatch):
+    import frigate.gen
+    from frigate.cache import ChartCache
+
+    cache = ChartCache(str(tmp_path))
+    docs = frigate.gen.gen(simple_chart_path, "markdown", deps=False, cache=cache)
+
+    def fail(*args, **kwargs):
+        raise AssertionError("chart should have been loaded from the cache")
+
+    monkeypatch.setattr(frigate.gen, "load_chart", fail)
+    assert frigate.gen.gen(simple_chart_path, "markdown", deps=False, cache=cache) == docs
+
+
+def test_cache_encoders(simple_chart_path, tmp_path):
+    import functools
+    import json
+
+    from frigate.cache import ChartCache
+    from frigate.gen import gen
+
+    cache = ChartCache(str(tmp_path))
+    spaced = gen(simple_chart_path, "markdown", deps=False, cache=cache, encoder=functools.partial(json.dumps))
+    compact = functools.partial(json.dumps, separators=(",", ":"))
+    assert gen(simple_chart_path, "markdown", deps=False, cache=cache, encoder=compact) != spaced
+
+    # Lambdas can't be told apart so their rows aren't cached
+    first = gen(simple_chart_path, "markdown", deps=False, cache=cache, encoder=lambda value: "a")
+    assert gen(simple_chart_path, "markdown", deps=False, cache=cache, encoder=lambda value: "b") != first
+
+
+def test_cache_unwritable(simple_chart_path, tmp_path):
+    from frigate.cache import ChartCache
+    from frigate.gen import gen
+
+    (tmp_path / "file").write_text("")
+    cache = ChartCache(str(tmp_path / "file" / "cache"))
+    assert gen(simple_chart_path, "markdown", deps=False, cache=cache)
+
+    # Entries which fail to serialize don't leave temporary files behind
+    cache = ChartCache(str(tmp_path / "entries"))
+    values = []
+    values.append(values)
+    with pytest.raises(ValueError):
+        cache.put("key", {}, [["a", "", values]])
+    assert os.listdir(tmp_path / "entries") == []
+
+
+def test_cache_directory_subchart(tmp_path):
+    from frigate.cache import ChartCache
+    from frigate.gen import load_chart_with_dependencies
+
+    chartdir = tmp_path / "chart"
+    subchart = chartdir / "charts" / "sub"
+    subchart.mkdir(parents=True)
+    (chartdir / "Chart.yaml").write_text(
+        "name: parent\nversion: 0.1.0\ndependencies:\n  - name: sub\n    version: 0.1.0\n"
+    )
+    (chartdir / "values.yaml").write_text("a: 1\n")
+    (subchart / "Chart.yaml").write_text("name: sub\nversion: 0.1.0\n")
+    (subchart / "values.yaml").write_text("b: old\n")
+
+    cache = ChartCache(str(tmp_path / "cache"))
+    _, values = cache.load(load_chart_with_dependencies, str(chartdir))
+    assert ("sub.b", "", '"old"') in [tuple(row) for row in values]
+    (subchart / "values.yaml").write_text("b: new\n")
+    _, values = cache.load(load_chart_with_dependencies, str(chartdir))
+    assert ("sub.b", "", '"new"') in [tuple(row) for row in values]
+
+
+def test_cache_eviction(simple_chart_path, rich_chart_path, tmp_path):
+    from frigate.cache import ChartCache
+    from frigate.gen import load_chart
+
+    cache = ChartCache(str(tmp_path), max_size=1)
+    simple_key = cache.key(simple_chart_path)
+    cache.put(simple_key, *load_chart(simple_chart_path))
+    assert cache.get(simple_key) is None
+
+    cache.max_size = 1024 * 1024
+    cache.put(simple_key, *load_chart(simple_chart_path))
+    rich_key = cache.key(rich_chart_path)
+    assert rich_key != simple_key
+    cache.put(rich_key, *load_chart(rich_chart_path))
+    assert cache.get(simple_key) is not None
+    assert cache.get(rich_key) is not None
+
+
+@pytest.mark.parametrize("fast", [False, True])
+@pytest.mark.parametrize("chart_name", ["simple", "rich", "deps"])
+def test_incremental_values(chart_name, fast, tmp_path):
+    from frigate.cache import ChartCache
+    from frigate.gen import load_chart
+
+    chartdir = os.path.join(MODULE_ROOT, "tests", "mockcharts", chart_name)
+    cache = ChartCache(str(tmp_path))
+    _, values = load_chart(chartdir)
+    for _ in range(2):
+        _, incremental = load_chart(chartdir, fast=fast, incremental=cache)
+        assert [tuple(row) for row in incremental] == [tuple(row) for row in values]
+
+
+def test_incremental_reuses_blocks(tmp_path, monkeypatch):
+    import frigate.gen
+    from frigate.cache import ChartCache
+
+    values_path = tmp_path / "values.yaml"
+    values_path.write_text("# header\na: 1  # first\n\nb:\n  c: 2\nd: [3]\n")
+    cache = ChartCache(str(tmp_path / "cache"))
+    frigate.gen.incremental_values(str(values_path), cache, fast=True)
+
+    parsed = []
+
+    def fast_load(text):
+        parsed.append(text)
+        return load(text)
+
+    load = frigate.gen.fast_load
+    monkeypatch.setattr(frigate.gen, "fast_load", fast_load)
+    values_path.write_text("# header\na: 1  # first\n\nb:\n  c: 4  # edited\nd: [3]\n")
+    values = frigate.gen.incremental_values(str(values_path), cache, fast=True)
+    assert parsed == ["b:\n  c: 4  # edited\n"]
+    assert [tuple(row) for row in values] == [
+        ("a", "first", "1"),
+        ("b.c", "edited", "4"),
+        ("d", "", "[3]"),
+    ]
+
+    # Anchors span blocks so the whole file is parsed
+    values_path.write_text("a: &a 1\nb: *a\n")
+    assert frigate.gen.split_values(values_path.read_text()) is None
+    values = frigate.gen.incremental_values(str(values_path), cache, fast=True)
+    assert [tuple(row) for row in values] == [("a", "", "1"), ("b", "", "1")]
+
+    # Values which continue on unindented lines can't be parsed block by block
+    for text, expected in [
+        ("key: {a: 1,\nb: 2}\n", [("key.a", "", "1"), ("key.b", "", "2")]),
+        ('key: "abc\ndef"\n', [("key", "", '"abc def"')]),
+    ]:
+        values_path.write_text(text)
+        for fast in (False, True):
+            values = frigate.gen.incremental_values(str(values_path), cache, fast=fast)
+            assert [tuple(row) for row in values] == expected
+
+    # Merge keys at the top level are split off from the keys they merge into
+    values_path.write_text("<<: {a: 1}\nb: 2\n")
+    assert frigate.gen.split_values(values_path.read_text()) is None
+    for fast in (False, True):
+        values = frigate.gen.incremental_values(str(values_path), cache, fast=fast)
+        assert [tuple(row) for row in values] == [("b", "", "2"), ("a", "", "1")]
+
+    # Entries are only rewritten when a block changed, and never for unnamed encoders
+    values_path.write_text("a: 1\nb: 2\n")
+    frigate.gen.incremental_values(str(values_path), cache, fast=True)
+    puts = []
+    monkeypatch.setattr(cache, "put", lambda *args: puts.append(args))
+    frigate.gen.incremental_values(str(values_path), cache, fast=True)
+    frigate.gen.incremental_values(str(values_path), cache, fast=True, encoder=lambda value: str(value))
+    assert puts == []
+
+
+ANCHORED_VALUES = """
+base: &base  # not a leaf
+  cpu: 1  # cpu count
+  nested:
+    deep: true  # deep comment
+other: &other {memory: 2}
+component:
+  extra: 0
+  <<: [*base, *other]
+  cpu: 3  # overridden
+alias: *base
+empty: {}  # empty mapping
+flow: {a: 1, b: {c: 2}}  # on the flow mapping
+hosts:  # hostnames
+  - host: example.com  # not a parameter
+last: 1
+"""
+
+
+@pytest.mark.parametrize("chart_name", ["simple", "rich", "deps"])
+def test_stream_values(chart_name):
+    from frigate.gen import load_chart, stream_values
+
+    chart_path = os.path.join(MODULE_ROOT, "tests", "mockcharts", chart_name)
+    _, values = load_chart(chart_path)
+
+    assert list(stream_values(os.path.join(chart_path, "values.yaml"))) == values
+
+
+def test_stream_anchors(yaml, tmp_path):
+    from frigate.gen import fast_load, stream_values, traverse
+
+    values_path = tmp_path / "values.yaml"
+    values_path.write_text(ANCHORED_VALUES)
+    expected = list(traverse(yaml.load(ANCHORED_VALUES), root=["root"]))
+
+    assert list(traverse(fast_load(ANCHORED_VALUES), root=["root"])) == expected
+    assert list(stream_values(str(values_path), root=["root"])) == expected
+
+
+@pytest.mark.parametrize("text", ["a: 1\na: 2\n", "a:\n  b: 1\n  b: 2\n"])
+def test_stream_duplicate_keys(tmp_path, text):
+    from ruamel.yaml.constructor import DuplicateKeyError
+
+    from frigate.gen import stream_values
+
+    values_path = tmp_path / "values.yaml"
+    values_path.write_text(text)
+    with pytest.raises(DuplicateKeyError):
+        list(stream_values(str(values_path)))
+
+
+def test_stream_multiple_documents(tmp_path):
+    from ruamel.yaml.composer import ComposerError
+
+    from frigate.gen import fast_load, stream_values
+
+    values_path = tmp_path / "values.yaml"
+    values_path.write_text("a: 1 # c\n---\n")
+    with pytest.raises(ComposerError):
+        fast_load(values_path.read_text())
+    with pytest.raises(ComposerError):
+        list(stream_values(str(values_path)))
+
+
+def test_stream_anchor_comments(tmp_path, monkeypatch):
+    import frigate.gen
+
+    constructors = []
+
+    class FastConstructor(frigate.gen.FastConstructor):
+        def __init__(self, *args, **kwargs):
+            super().__init__(*args, **kwargs)
+            constructors.append(self)
+
+    monkeypatch.setattr(frigate.gen, "FastConstructor", FastConstructor)
+    values_path = tmp_path / "values.yaml"
+    values_path.write_text(
+        "base: &base {cpu: 1}  # base\n"
+        + "".join(f"key{index}: [{{name: {index}}}]  # key\n" for index in range(100))
+        + "alias: *base\n"
+    )
+    rows = list(frigate.gen.stream_values(str(values_path)))
+    assert len(rows) == 102
+    # Only the comments aliases can reach are kept
+    assert list(constructors[0].line_comments) == [0]
+
+
+def test_traverse_deeply_nested():
+    import sys
+
+    from ruamel.yaml.comments import CommentedMap
+
+    from frigate.gen import traverse
+
+    depth = sys.getrecursionlimit() + 100
+    tree = CommentedMap([("leaf", "bottom")])
+    for level in range(depth):
+        tree = CommentedMap([("c", level), ("b", tree), ("d", CommentedMap())])
+
+    rows = list(traverse(tree, root=["root"]))
+
+    assert len(rows) == 2 * depth + 1
+    assert rows[0] == ["root.c", "", str(depth - 1)]
+    assert rows[1] == ["root.b.c", "", str(depth - 2)]
+    assert rows[depth] == ["root" + ".b" * depth + ".leaf", "", '"bottom"']
+    assert rows[depth + 1] == ["root" + ".b" * (depth - 1) + ".d", "", "{}"]
+    assert rows[-1] == ["root.d", "", "{}"]
+
+
+def test_value_row():
+    from frigate.gen import ValueRow, squash_duplicate_values
+
+    row = ValueRow("hello", "a comment", '"world"')
+    param, comment, default = row
+
+    assert (param, comment, default) == ("hello", "a comment", '"world"')
+    assert row.param == row[0] == "hello"
+    assert row == ["hello", "a comment", '"world"']
+    assert not hasattr(row, "__dict__")
+
+    duplicate = ValueRow("hello", "", '"there"')
+    assert squash_duplicate_values([row, duplicate])[0] is row
+
+
+def test_lazy_defaults(yaml):
+    from frigate.gen import traverse
+
+    calls = []
+
+    def encoder(value):
+        calls.append(value)
+        return "encoded"
+
+    tree = yaml.load("shared: &shared [1, 2]\nalias: *shared\nother: {}\n")
+    rows = list(traverse(tree, encoder=encoder))
+    assert calls == []
+
+    assert [row.default for row in rows] == ["encoded"] * 3
+    assert calls == [[1, 2], {}]
+    assert rows[0].default == "encoded"
+    assert len(calls) == 2
+
+
+def test_lazy_dependency_defaults(deps_chart_path):
+    from frigate.gen import load_chart_with_dependencies
+
+    calls = []
+
+    def encoder(value):
+        calls.append(value)
+        return "encoded"
+
+    # Merging in dependencies drops duplicate rows without serializing any defaults
+    _, values = load_chart_with_dependencies(deps_chart_path, encoder=encoder)
+    assert [row[0] for row in values]
+    assert calls == []
+
+
+def test_comment_index(rich_chart_path, yaml):
+    from frigate.gen import comment_index, get_comment
+
+    with open(os.path.join(rich_chart_path, "values.yaml")) as fh:
+        tree = yaml.load(fh.read())
+
+    for mapping in (tree, tree["image"], tree["ingress"]):
+        index = comment_index(mapping)
+        for key in mapping:
+            expected = get_comment(mapping, key) if key in mapping.ca.items else ""
+            assert index.get(key, "") == expected
+    assert comment_index(tree["ingress"])["annotations"] == "ingress annotations"
+
+
+ALIAS_BOMB = """
+a: &a [1, 1, 1, 1, 1, 1, 1, 1, 1, 1]
+b: &b [*a, *a, *a, *a, *a, *a, *a, *a, *a, *a]
+c: &c [*b, *b, *b, *b, *b, *b, *b, *b, *b, *b]
+d: &d [*c, *c, *c, *c, *c, *c, *c, *c, *c, *c]
+e: &e {d1: *d, d2: *d, d3: *d, d4: *d, d5: *d, d6: *d, d7: *d, d8: *d, d9: *d}
+f: {e1: *e, e2: *e, e3: *e, e4: *e, e5: *e, e6: *e, e7: *e, e8: *e, e9: *e}
+"""
+
+
+def test_alias_memoization(yaml):
+    from frigate.gen import traverse
+
+    tree = yaml.load(ALIAS_BOMB)
+    rows = list(traverse(tree, max_expansion=10 ** 7))
+
+    assert len(rows) == 4 + 9 + 81
+    assert rows[-1] == ["f.e9.d9", "", json.dumps([[[[1] * 10] * 10] * 10] * 10)]
+    assert rows[-1].default is rows[4].default
+
+
+@pytest.mark.parametrize("fast", [False, True])
+def test_alias_expansion_limit(yaml, fast):
+    from frigate.gen import fast_load, traverse
+
+    tree = fast_load(ALIAS_BOMB) if fast else yaml.load(ALIAS_BOMB)
+    with pytest.raises(ValueError, match="limit"):
+        traverse(tree, max_expansion=10 ** 5)
+
+    with pytest.raises(ValueError, match="recursive"):
+        traverse(fast_load("a: &a [1, *a]"))
+
+
+def test_alias_expansion_large_tree(yaml):
+    from frigate.gen import fast_load, traverse
+
+    text = "small: &small {a: 1}\nalias: *small\nbig:\n" + "".join(
+        f"  key{index}: {index}\n" for index in range(2000)
+    )
+    for tree in (yaml.load(text), fast_load(text)):
+        assert len(list(traverse(tree, max_expansion=10))) == 2002
+
+
+def test_stream_alias_expansion_limit(tmp_path):
+    from frigate.gen import stream_values
+
+    values_path = tmp_path / "values.yaml"
+    values_path.write_text(ALIAS_BOMB)
+    with pytest.raises(ValueError, match="limit"):
+        list(stream_values(str(values_path), max_expansion=10 ** 4))
+
+
+def test_cache_alias_expansion_limit(tmp_path):
+    from frigate.cache import ChartCache
+    from frigate.gen import gen
+
+    chartdir = tmp_path / "chart"
+    chartdir.mkdir()
+    (chartdir / "Chart.yaml").write_text("name: bomb\nversion: 0.1.0\n")
+    (chartdir / "values.yaml").write_text(ALIAS_BOMB)
+    cache = ChartCache(str(tmp_path / "cache"))
+    gen(str(chartdir), "markdown", deps=False, cache=cache, max_expansion=10 ** 7)
+    # A lower limit isn't bypassed by rows cached under a higher one
+    with pytest.raises(ValueError, match="limit"):
+        gen(str(chartdir), "markdown", deps=False, cache=cache, max_expansion=10 ** 4)
+
+
+def test_precompiled_templates(simple_chart_path, tmp_path, monkeypatch, template_cache):
+    import shutil
+
+    import jinja2
+
+    import frigate.precompile
+    from frigate import TEMPLATES_PATH
+    from frigate.gen import load_chart
+    from frigate.precompile import compile_templates, compiled_loader
+
+    chart, values = load_chart(simple_chart_path)
+    source = jinja2.Environment(loader=jinja2.FileSystemLoader(TEMPLATES_PATH))
+    expected = source.get_template("markdown.jinja2").render(**chart, values=values, credits=True)
+    compile_templates(str(tmp_path / "compiled"))
+    assert isinstance(compiled_loader(str(tmp_path / "compiled")), jinja2.ModuleLoader)
+
+    monkeypatch.setattr(frigate.precompile, "COMPILED_TEMPLATES_PATH", str(tmp_path / "compiled"))
+    frigate.gen._environment.cache_clear()
+    environment = frigate.gen._environment(None)
+    assert isinstance(environment.loader.loaders[-1], jinja2.ModuleLoader)
+    template = environment.get_template("markdown.jinja2")
+    assert template.render(**chart, values=values, credits=True) == expected
+
+    # Edited source templates aren't served from stale compiled ones
+    templates = tmp_path / "templates"
+    shutil.copytree(TEMPLATES_PATH, templates)
+    monkeypatch.setattr(frigate.precompile, "TEMPLATES_PATH", str(templates))
+    assert compiled_loader(str(tmp_path / "compiled")) is not None
+    (templates / "markdown.jinja2").write_text("edited")
+    assert compiled_loader(str(tmp_path / "compiled")) is None
+
+    (tmp_path / "compiled" / "jinja_version.txt").write_text("0.0")
+    assert compiled_loader(str(tmp_path / "compiled")) is None
+    assert compiled_loader(str(tmp_path / "missing")) is None
+
+
+def test_helm_updater_async(tmp_path, fake_helm, monkeypatch):
+    import asyncio
+    import time
+
+    from frigate.deps import HelmUpdater
+
+    chartdir = tmp_path / "chart"
+    chartdir.mkdir()
+    (chartdir / "Chart.yaml").write_text(
+        "name: parent\nversion: 0.1.0\ndependencies:\n"
+        "  - name: simple\n    version: ^0.1.0\n    repository: https://example.com\n"
+    )
+
+    async def update_twice(updater):
+        await asyncio.gather(updater.update_async(str(chartdir)), updater.update_async(str(chartdir)))
+
+    asyncio.run(update_twice(HelmUpdater()))
+    assert fake_helm.read_text().splitlines() == ["dep update ."]
+
+    monkeypatch.setenv("HELM_MODE", "slow")
+    updater = HelmUpdater()
+
+    async def cancel_update():
+        task = asyncio.ensure_future(updater.update_async(str(chartdir)))
+        await asyncio.sleep(0.2)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+    start = time.monotonic()
+    asyncio.run(cancel_update())
+    assert time.monotonic() - start < 2
+    assert not updater.processes and not updater.updates
+
+
+@pytest.mark.parametrize("chart_name", ["simple", "rich", "deps"])
+def test_gen_async(chart_name):
+    import asyncio
+    import io
+
+    from frigate.gen import gen, gen_async
+
+    chart_path = os.path.join(MODULE_ROOT, "tests", "mockcharts", chart_name)
+    expected = gen(chart_path, "markdown")
+    assert asyncio.run(gen_async(chart_path, "markdown")) == expected
+
+    output = io.StringIO()
+    assert asyncio.run(gen_async(chart_path, "markdown", output=output)) is None
+    assert output.getvalue() == expected
+
+
+def test_gen_async_renders_in_executor(simple_chart_path, monkeypatch):
+    import asyncio
+    import io
+    import threading
+
+    import frigate.gen
+    from frigate.renderers import render_markdown
+
+    threads = set()
+
+    def renderer(*args, **kwargs):
+        for chunk in render_markdown(*args, **kwargs):
+            threads.add(threading.current_thread())
+            yield chunk
+
+    monkeypatch.setitem(frigate.gen.RENDERERS, "markdown", renderer)
+    monkeypatch.setattr(frigate.gen, "RENDER_BATCH_SIZE", 2)
+    expected = frigate.gen.gen(simple_chart_path, "markdown")
+    threads.clear()
+
+    # Native renderers don't block the event loop
+    assert asyncio.run(frigate.gen.gen_async(simple_chart_path, "markdown")) == expected
+    output = io.StringIO()
+    asyncio.run(frigate.gen.gen_async(simple_chart_path, "markdown", output=output))
+    assert output.getvalue() == expected
+    assert threading.main_thread() not in threads
+
+
+def test_gen_split(deps_chart_path, tmp_path):
+    from click.testing import CliRunner
+
+    from frigate.cli import cli
+    from frigate.gen import gen_split, group_values, load_chart_with_dependencies
+
+    _, values = load_chart_with_dependencies(deps_chart_path)
+    groups = group_values(values)
+    assert "simple" in groups
+    assert all(row.param.split(".")[0] == key for key, rows in groups.items() for row in rows)
+
+    output_dir = tmp_path / "docs"
+    result = CliRunner().invoke(
+        cli, ["gen", deps_chart_path, "-o", "markdown", "-o", "rst", "--split", str(output_dir)]
+    )
+    assert result.exit_code == 0
+    index = (output_dir / "README.md").read_text()
+    for key, rows in groups.items():
+        assert f"[`{key}`]({key}.md) | {len(rows)} |" in index
+        part = (output_dir / f"{key}.md").read_text()
+        assert all(f"`{row.param}`" in part for row in rows)
+        assert (output_dir / f"{key}.rst").exists()
+
+    assert gen_split(deps_chart_path, "markdown", str(output_dir)) == []
+    (output_dir / "simple.md").write_text("stale")
+    assert gen_split(deps_chart_path, "markdown", str(output_dir), parts=["simple"]) == [
+        str(output_dir / "simple.md")
+    ]
+    with pytest.raises(ValueError):
+        gen_split(deps_chart_path, "base", str(output_dir))
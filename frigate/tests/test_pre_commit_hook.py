@@ -27,3 +27,14 @@ def test_hook_simple(charts):
     os.chdir(os.path.join(charts, "simple"))
     assert main("README.md", "markdown") == 1
     assert os.path.isfile("README.md")
+
+
+def test_hook_unchanged(charts):
+    from frigate.pre_commit_hook import main
+
+    os.chdir(os.path.join(charts, "simple"))
+    assert main("README.md", "markdown") == 1
+    mtime = os.stat("README.md").st_mtime_ns
+    assert main("README.md", "markdown") == 0
+    assert os.stat("README.md").st_mtime_ns == mtime
+    assert not [name for name in os.listdir(".") if name.endswith(".tmp")]
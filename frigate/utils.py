@@ -1,9 +1,77 @@
 import collections.abc
+import filecmp
 import os
+import shutil
+import tempfile
 
 from frigate import TEMPLATES_PATH
 
 
+class ValueRow:
+    """A documented parameter with its description and default value.
+
+    Rows are stored in slots rather than as lists to keep large charts compact in
+    memory, but still unpack like a ``(param, comment, default)`` tuple so templates
+    can loop over ``for (param, comment, default) in values``.
+
+    When an ``encoder`` is given ``default`` is the raw value, which is only serialized
+    by calling ``encoder`` the first time the default is accessed.
+
+    Args:
+        param (str): The fully namespaced parameter.
+        comment (str): Description of the parameter.
+        default (str): JSON representation of the default value, or the raw value when
+            an ``encoder`` is given.
+        encoder (callable, optional): Function to serialize the raw default with.
+
+    """
+
+    __slots__ = ("param", "comment", "_default", "_encoder")
+
+    def __init__(self, param, comment, default, encoder=None):
+        self.param = param
+        self.comment = comment
+        self._default = default
+        self._encoder = encoder
+
+    @property
+    def default(self):
+        if self._encoder is not None:
+            self._default = self._encoder(self._default)
+            self._encoder = None
+        return self._default
+
+    def with_prefix(self, prefix):
+        """Return a copy of this row namespaced under ``prefix``, sharing its default."""
+        return ValueRow(prefix + self.param, self.comment, self._default, self._encoder)
+
+    def __iter__(self):
+        yield self.param
+        yield self.comment
+        yield self.default
+
+    def __len__(self):
+        return 3
+
+    def __getitem__(self, index):
+        # Looking up the param or comment mustn't serialize the default
+        if index == 0:
+            return self.param
+        if index == 1:
+            return self.comment
+        return (self.param, self.comment, self.default)[index]
+
+    def __eq__(self, other):
+        if isinstance(other, (ValueRow, list, tuple)):
+            return tuple(self) == tuple(other)
+        return NotImplemented
+
+    __hash__ = None
+
+    def __repr__(self):
+        return f"ValueRow({self.param!r}, {self.comment!r}, {self.default!r})"
+
+
 def flatten(nested_list):
     """Flatten a list of nested lists with unknown depth.
 
@@ -32,9 +100,60 @@ def flatten(nested_list):
             yield element
 
 
+def write_if_changed(path, write):
+    """Write a file only if its contents would change.
+
+    The new contents are written to a temporary file next to ``path`` which is
+    compared with the existing file in blocks, so neither is held in memory. The
+    existing file is only replaced, keeping its permissions, if they differ.
+
+    Args:
+        path (str): Path of the file to write.
+        write (callable): Function which writes the new contents to the text file it is passed.
+
+    Returns:
+        bool: Whether the file was written.
+
+    """
+    fd, tmpname = tempfile.mkstemp(dir=os.path.dirname(path) or ".", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "w") as fh:
+            write(fh)
+        if os.path.isfile(path) and filecmp.cmp(path, tmpname, shallow=False):
+            return False
+        if os.path.exists(path):
+            shutil.copymode(path, tmpname)
+        else:
+            os.chmod(tmpname, 0o666 & ~_umask())
+        os.replace(tmpname, path)
+        return True
+    finally:
+        if os.path.exists(tmpname):
+            os.remove(tmpname)
+
+
+def _umask():
+    umask = os.umask(0)
+    os.umask(umask)
+    return umask
+
+
 def list_templates():
     templates = []
     for template in os.listdir(TEMPLATES_PATH):
         [template, _] = template.split(".")
         templates.append(template)
     return templates
+
+
+def format_extension(output_format):
+    """Return the file extension for documentation in an output format.
+
+    Args:
+        output_format (str): Output format, such as ``markdown``.
+
+    Returns:
+        str: The extension without a leading dot.
+
+    """
+    return {"markdown": "md"}.get(output_format, output_format)
@@ -22,6 +22,24 @@ if "GIT_DESCRIBE_TAG" in os.environ:
 else:
     version = versioneer.get_version()
 
+cmdclass = versioneer.get_cmdclass()
+
+
+class build_py(cmdclass["build_py"]):
+    """Precompile the built-in templates into the built package."""
+
+    def run(self):
+        super().run()
+        # jinja2 is a build requirement, see pyproject.toml
+        from frigate.precompile import compile_templates
+
+        compile_templates(
+            os.path.join(self.build_lib, PACKAGE_NAME, "compiled_templates")
+        )
+
+
+cmdclass["build_py"] = build_py
+
 setup(
     name=PACKAGE_NAME,
     version=version,
@@ -38,6 +56,6 @@ setup(
     zip_safe=False,
     platforms="any",
     install_requires=REQUIRES,
-    cmdclass=versioneer.get_cmdclass(),
+    cmdclass=cmdclass,
     entry_points={"console_scripts": ["frigate = frigate.cli:cli"]},
 )